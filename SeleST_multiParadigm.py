@@ -0,0 +1,29 @@
+"""
+Selective Stopping Toolbox (SeleST) - Multi-paradigm session
+
+    Script used to run several paradigms one after the other in a single session (e.g., SST then ARI), without
+    restarting SeleST between paradigms. The GUIs are only shown once and the same window and response device are used
+    for all paradigms. Each paradigm is saved to its own data files. If the session is interrupted (and checkpoints are
+    saved, see 'Save checkpoints?' in the advanced settings), run this script again with 'Resume session?' selected to
+    continue the interrupted paradigm and then run the paradigms after it.
+    See the SeleST.py script for general information on the task and lib/SeleST_session.py for more information on
+    how the session is run.
+"""
+
+# Some general housekeeping before we start
+# import required modules
+import os
+from lib import SeleST_session
+# ensure that the relative paths start from the same directory as this script
+_thisDir = os.path.dirname(os.path.abspath(__file__))
+os.chdir(_thisDir)
+
+# Here we are setting the paradigms to run (in order). Each paradigm can be given its own general and advanced
+# settings, e.g., {'Paradigm': 'ARI', 'RT type': 'Choice', 'Response mode': 'Wait-and-press', 'genSettings': {'n blocks': 6}}
+sessionConfigs = [
+    {'Paradigm': 'SST', 'RT type': 'Choice', 'Response mode': 'Wait-and-press'},
+    {'Paradigm': 'ARI', 'RT type': 'Choice', 'Response mode': 'Wait-and-press'}]
+
+#   ---SeleST_session---
+# Here we are running each paradigm in turn (see SeleST_session.runSession)
+SeleST_session.runSession(_thisDir, sessionConfigs)
@@ -14,6 +14,9 @@ from __future__ import absolute_import, division
 import numpy as np  # whole numpy lib is available, prepend 'np.'
 import os  # handy system and path functions
 import pandas as pd
+import json
+from concurrent.futures import ProcessPoolExecutor
+from lib import SeleST_trials # functions used to generate the trial arrays
 # ensure that the relative paths start from the same directory as this script
 _thisDir = os.path.dirname(os.path.abspath(__file__))
 os.chdir(_thisDir)
@@ -32,11 +35,15 @@ if not os.path.exists(_thisDir + os.sep +'conditions/'): # create conditions dir
 filePath = _thisDir + os.sep + u'conditions//' # file path to export files to (default is conditions but this can be modified)
 fileName = 'example_trials' # name of file
 n_participants = 1 # number of participants to generate trials files for
+masterSeed = None # seed used to generate all trials files (None = new random seed), set this to the master seed saved with existing files to recreate them exactly
+n_workers = None # number of processes used to create files (None = all cores)
 
 # Here you can set the randomisation options you would like to enable (True) or disable (False)
 randomiseTrials = True # completely randomise the order of trials within a block
 forceGoStart = True # make sure every block starts with x number of go trials
 n_forcedGo = 3 # set this to the number of go trials you would like at the start of every block
+maxStopRun = 0 # maximum number of stop trials in a row (0 = no limit)
+minStopGap = 0 # minimum number of trials between two stop trials of the same type (0 = no limit)
 
 # Here we are setting the number of blocks we would like to create (generated from the trial information below)
 # NOTE: the number set in taskInfo from SeleST_initialise.Experiment needs to match the number below
@@ -69,20 +76,7 @@ n_blocks = 12
 # Additional variables (e.g., L_targetTime & R_targetTime) can easily be included by inserting an additional 
 # variable to the dictionary and adding the variable to SeleST_run.Start_trial
 
-# Create an empty dataframe with relevant variables
-# NOTE: column names should match the names within the trialList dictionaries
-trialTable = pd.DataFrame(columns=[
-    'n_repeats',
-    'trialName',
-    'trialType',
-    'ssd',
-    'go_color',
-    'stop_color',
-    'L_cue_color',
-    'R_cue_color'
-#    'L_targetTime',
-#    'R_targetTime'
-    ])
+# NOTE: every trial type should include the same variables, each variable becomes a column of the trials file
 
 trialList = [ # list of trial types
 
@@ -139,43 +133,29 @@ trialList = [ # list of trial types
 #
 #---------------------------------------------------------------------------
 
-# Here we are creating a standard block (list of trials w/ trialType details)
-for i in range(0,len(trialList)): # iterate over no. of trial types
-    trialList_temp = (np.array(trialList[i]['n_repeats']*[i])).tolist() # create temporary list w/ n_repeats for a trial type
-    for j in trialList_temp: # iterate over no. of repeats for particular trial type
-        trialTable = trialTable.append(trialList[i],ignore_index=True) # append dictionary info for trialType to trialTable
-del(trialTable['n_repeats']) # remove n_repeats column from trialTable
-
-# Here we are creating unique trials files by iterating over n_participants & n_blocks
-# Each block will be randomised individually and then concatenated to make a complete trial table
+# Here we are creating unique trials files for each of n_participants
+# A standard block is created from the trialList (see SeleST_trials.blockColumns) and the trials of each block are
+# randomised individually before the blocks are combined to make a complete trial table
 #   e.g., 10 blocks * 36 trials = 360 trials
-for j in range(1,n_participants + 1):  # iterate over desired number of participants
-    for n in range(1,n_blocks + 1): # iterate over desired number of blocks
-                
-        # Randomise the list of trials if the option is enabled
-        if randomiseTrials == True:
-            np.random.shuffle(trialTable.values)
-                   
-        # Force x amount of go trials at the start of every block, if the option is enabled        
-        if forceGoStart == True:
-            forceGoStart_shuffle = True # enable shuffling within this iteration
-            while forceGoStart_shuffle == True:
-                trialTableTemp = trialTable.iloc[:n_forcedGo] # create temporary trialTable based on n_forcedGo
-                if trialTableTemp['trialType'].sum() > n_forcedGo: # randomise trials if n_forcedGo criterion is not meant (NOTE: this works as trialType = 1 for go trials)
-                    np.random.shuffle(trialTable.values)
-                    trialTableTemp = trialTable.iloc[:n_forcedGo]
-                elif trialTableTemp['trialType'].sum() <= n_forcedGo: # break the loop if the n_forcedGo criterion is met
-                      break
-                      trialTable = trialTable.append(trialTableTemp,ignore_index=True) # Adds trialTableTemp to trialTable 
-                      
-        if n == 1:
-            trialTable_complete = trialTable # create the complete trialTable if we are within the first iteration
-        if n > 1:
-            trialTable_complete = pd.concat([trialTable_complete, trialTable], ignore_index = True) # append to the complete trialTable for subsequent blocks            
-    print(trialTable_complete) # print trial table to console
+# Each participant's trials are randomised with their own seed, derived from the master seed and participant number
+# (see SeleST_trials.participantSeed), which is saved next to the trials file (e.g., 'example_trials_1_seed.json').
+# Files can therefore be created in parallel and any file can be recreated exactly from the master seed.
+def createTrialsFile(j, seed):
+    rng = np.random.default_rng(SeleST_trials.participantSeed(seed, j))
+    trialTable_complete = pd.DataFrame(SeleST_trials.trialArray(trialList, n_blocks, randomise=randomiseTrials,
+        nForcedGo=n_forcedGo if forceGoStart == True else 0, maxStopRun=maxStopRun, minStopGap=minStopGap, rng=rng)) # trial orders are built to meet the constraints directly
     
     # Export trialTable to a csv file based on the information above and n_participants
-    trialTable_complete.to_csv(filePath + fileName + '_' + str(j) + '.csv', index=False)    
-
-    # Reset the trialTable_complete dataframe
-    trialTable_complete = trialTable_complete[0:0]        
+    trialTable_complete.to_csv(filePath + fileName + '_' + str(j) + '.csv', index=False)
+    with open(filePath + fileName + '_' + str(j) + '_seed.json', 'w') as f: # save seed and settings used to create the file
+        json.dump({'masterSeed': seed, 'participant': j, 'numpyVersion': np.__version__, 'n_blocks': n_blocks, 'randomiseTrials': randomiseTrials,
+            'forceGoStart': forceGoStart, 'n_forcedGo': n_forcedGo, 'maxStopRun': maxStopRun, 'minStopGap': minStopGap, 'trialList': trialList}, f, indent=1)
+    return fileName + '_' + str(j) + '.csv', len(trialTable_complete)
+
+if __name__ == '__main__': # needed for parallel processing
+    if masterSeed is None:
+        masterSeed = np.random.SeedSequence().entropy # new random master seed
+    print('Master seed is %s'%masterSeed)
+    with ProcessPoolExecutor(max_workers=n_workers) as pool:
+        for file, n_trials in pool.map(createTrialsFile, range(1,n_participants + 1), [masterSeed]*n_participants, chunksize=16):
+            print('Created %s (%s trials)'%(file, n_trials)) # print progress to console
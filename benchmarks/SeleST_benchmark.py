@@ -0,0 +1,227 @@
+"""
+Selective Stopping Toolbox (SeleST) benchmarks
+
+    SeleST_benchmark
+        Times the parts of the task engine and analysis pipeline separately on synthetic inputs:
+            - runTrial (+ stop_signal) per frame for ARI and SST, simple and choice RT (null window, see SeleST_headless)
+            - Block (ordering the trials of a block) scaled by the number of trials per block
+            - saveData and staircaseSSD per call
+            - trial-file generation (SeleST_trials) scaled by the number of blocks and participants
+            - the example group analysis (processFile) scaled by the number of participants
+
+        Run from the SeleST folder: python benchmarks/SeleST_benchmark.py [--quick] [--no-save]
+        Results are added to benchmarks/SeleST_benchmark_history.json (not tracked by git) and compared with the
+        previous run on the same computer (a benchmark is flagged if it became more than 20% slower) and, for the frame loop, with the frame budget at 60/144/240 Hz
+        (flagged if the task engine uses more than a quarter of a frame, leaving the rest for drawing).
+
+    See the SeleST.py script for general information on the task
+"""
+
+# Import required modules
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import contextlib
+import subprocess
+import numpy as np
+
+_thisDir = os.path.dirname(os.path.dirname(os.path.abspath(__file__))) # SeleST folder
+sys.path.insert(0, _thisDir)
+sys.path.insert(0, os.path.join(_thisDir, 'example_analysis'))
+from lib import SeleST_headless # NOTE: imported first so that PsychoPy modules needing a display are replaced
+from lib import SeleST_initialize, SeleST_run, SeleST_trials
+
+historyFile = os.path.join(_thisDir, 'benchmarks', 'SeleST_benchmark_history.json')
+frameRates = [60, 144, 240] # frame budgets (Hz) to compare the frame loop with
+frameBudgetShare = 0.25 # share of a frame the task engine may use (the rest is left for drawing and flipping)
+regressionLimit = 1.2 # flag benchmarks that are this many times slower than in the previous run
+
+# Define timings function
+#   Summarises a list of times (s) in ms
+def timings(times):
+    times = np.asarray(times)*1000
+    return {'n': int(len(times)), 'mean_ms': float(times.mean()), 'p99_ms': float(np.percentile(times, 99)), 'max_ms': float(times.max())}
+
+# Define headlessTask context manager
+#   Sets up an experiment with a null window and simulated participant (see SeleST_headless) in a temporary folder
+@contextlib.contextmanager
+def headlessTask(taskInfo, genSettings=None, advSettings=None):
+    tempDir = tempfile.mkdtemp(prefix='SeleST_benchmark_')
+    vt = SeleST_headless.VirtualTime()
+    responder = SeleST_headless.SimulatedResponder(vt, seed=1)
+    taskInfo = dict({'Experiment name': 'benchmark', 'Participant ID': 'benchmark', 'Include practice?': False}, **taskInfo)
+    advSettings = dict({'Log frame timing?': False}, **(advSettings or {}))
+    try:
+        with SeleST_headless.virtualPsychoPy(vt, responder), contextlib.redirect_stdout(open(os.devnull, 'w')):
+            exp = SeleST_headless.Experiment_headless(tempDir, vt, responder, 60.0, taskInfo, genSettings, advSettings)
+            stimuli = SeleST_initialize.Stimuli(exp)
+            trialInfo = SeleST_initialize.Trials(exp)
+            stopInfo = SeleST_initialize.SSD(exp)
+            yield exp, stimuli, trialInfo, stopInfo
+            if exp.taskInfo['Save data?'] == True:
+                exp.dataWriter.close()
+                if exp.eventWriter is not None:
+                    exp.eventWriter.close()
+    finally:
+        shutil.rmtree(tempDir, ignore_errors=True)
+
+# Define benchFrames function
+#   Runs trials as SeleST_run.runTask does and times the work done on every frame (runTrial and stop_signal)
+def benchFrames(paradigm, rtType, nTrials):
+    frameTimes = []
+    with headlessTask({'Paradigm': paradigm, 'RT type': rtType, 'Save data?': False}) as (exp, stimuli, trialInfo, stopInfo):
+        core = SeleST_run.core
+        while trialInfo.trialCount < nTrials:
+            for trial in SeleST_run.Block(exp, trialInfo):
+                if trialInfo.trialCount == nTrials:
+                    break
+                trialInfo.trialCount = trialInfo.trialCount + 1
+                thisTrial = SeleST_run.Initialize_trial(exp, trialInfo, stopInfo, trial)
+                trialStimuli = SeleST_run.Start_Trial(exp, stimuli, trialInfo, thisTrial, trial)
+                trialTimer = core.CountdownTimer(exp.advSettings['Trial length (s)'])
+                stopTimer = core.CountdownTimer(thisTrial.stopTime/1000)
+                exp.rb.clock.reset()
+                exp.input.start()
+                while trialTimer.getTime() > 0:
+                    start = time.perf_counter()
+                    SeleST_run.runTrial(exp, stimuli, thisTrial, trialStimuli, trialTimer)
+                    if stopTimer.getTime() <= 0:
+                        SeleST_run.stop_signal(exp, stimuli, thisTrial, trialStimuli)
+                    frameTimes.append(time.perf_counter() - start)
+                    exp.win.flip()
+                exp.input.stop()
+    return timings(frameTimes)
+
+# Define benchBlock function
+#   Times SeleST_run.Block for blocks with scale times the default number of trials per block
+def benchBlock(scale, nBlocks, genSettings=None):
+    times = []
+    with headlessTask({'Save data?': False}, genSettings) as (exp, stimuli, trialInfo, stopInfo):
+        trialInfo.trialList = trialInfo.trialList*scale
+        trialInfo.choiceList = trialInfo.choiceList*scale
+        with contextlib.redirect_stdout(open(os.devnull, 'w')):
+            for n in range(nBlocks):
+                start = time.perf_counter()
+                SeleST_run.Block(exp, trialInfo)
+                times.append(time.perf_counter() - start)
+    return timings(times)
+
+# Define benchTrialEnd function
+#   Times saveData and staircaseSSD (per call) after a stop trial
+def benchTrialEnd(nCalls):
+    saveTimes, staircaseTimes = [], []
+    with headlessTask({'Save data?': True}) as (exp, stimuli, trialInfo, stopInfo):
+        trialInfo.blockTrialCount = 1
+        thisTrial = SeleST_run.Initialize_trial(exp, trialInfo, stopInfo, 2)
+        thisTrial.L_targetTime = thisTrial.R_targetTime = 800
+        with contextlib.redirect_stdout(open(os.devnull, 'w')):
+            for n in range(nCalls):
+                thisTrial.stopSuccess = n % 2
+                start = time.perf_counter()
+                SeleST_run.saveData(exp, trialInfo, thisTrial, 1.0)
+                saveTimes.append(time.perf_counter() - start)
+                start = time.perf_counter()
+                SeleST_run.staircaseSSD(exp, stopInfo, thisTrial)
+                staircaseTimes.append(time.perf_counter() - start)
+    return timings(saveTimes), timings(staircaseTimes)
+
+# Define benchTrialFiles function
+#   Times generating trial arrays (as SeleST_trialArrayCreator.py does) for nParticipants x nBlocks
+def benchTrialFiles(nBlocks, nParticipants):
+    trialList = [{'n_repeats': 24, 'trialName': 'Go', 'trialType': 1, 'ssd': 0}, {'n_repeats': 4, 'trialName': 'stop_all', 'trialType': 2, 'ssd': 1},
+        {'n_repeats': 4, 'trialName': 'stop_left', 'trialType': 3, 'ssd': 2}, {'n_repeats': 4, 'trialName': 'stop_right', 'trialType': 4, 'ssd': 3}]
+    start = time.perf_counter()
+    for j in range(1, nParticipants+1):
+        SeleST_trials.trialArray(trialList, nBlocks, nForcedGo=3, rng=np.random.default_rng(SeleST_trials.participantSeed(0, j)))
+    return timings([time.perf_counter() - start])
+
+# Define benchAnalysis function
+#   Times the example group analysis (processFile for every participant x paradigm) on the example data files
+def benchAnalysis(nParticipants):
+    import pandas as pd
+    import SeleST_analysis
+    import SeleST_example_group_analysis as groupAnalysis
+    info = groupAnalysis.parInfo.iloc[0].to_dict()
+    jobs = [(part, pdgm, info, os.path.join(_thisDir, 'example_analysis', 'ex_'+pdgm+'.txt')) for part in range(1, nParticipants+1) for pdgm in groupAnalysis.paradigms]
+    with contextlib.redirect_stdout(open(os.devnull, 'w')):
+        start = time.perf_counter()
+        SeleST_analysis.runFiles(groupAnalysis.processFile, jobs, nWorkers=1)
+    return timings([time.perf_counter() - start])
+
+# Define runBenchmarks function
+#   Runs all benchmarks and returns a dictionary of results (benchmark name -> timings)
+def runBenchmarks(quick=False):
+    results = {}
+    nTrials = 20 if quick else 100
+    for paradigm in ['ARI', 'SST']:
+        for rtType in ['Simple', 'Choice']:
+            results['frame_%s_%s' % (paradigm, rtType)] = benchFrames(paradigm, rtType, nTrials)
+    for scale in ([1, 4] if quick else [1, 4, 16]):
+        results['Block_x%s' % scale] = benchBlock(scale, 20 if quick else 100)
+        results['Block_x%s_constrained' % scale] = benchBlock(scale, 20 if quick else 100,
+            {'Max stop trials in a row': 2, 'Min trials between same stop type': 2, 'Balance choices across trial types?': True})
+    results['saveData'], results['staircaseSSD'] = benchTrialEnd(200 if quick else 2000)
+    for nBlocks in ([12] if quick else [12, 48]):
+        for nParticipants in ([10] if quick else [10, 100]):
+            results['trialFiles_%sblocks_%sparticipants' % (nBlocks, nParticipants)] = benchTrialFiles(nBlocks, nParticipants)
+    for nParticipants in ([1, 4] if quick else [1, 10, 40]):
+        results['groupAnalysis_%sparticipants' % nParticipants] = benchAnalysis(nParticipants)
+    return results
+
+# Define report function
+#   Prints results, compared with the frame budgets and the previous run, and returns a list of flagged benchmarks
+def report(results, previous=None):
+    flagged = []
+    print('%-45s %10s %10s %10s' % ('benchmark', 'mean (ms)', 'p99 (ms)', 'previous'))
+    for name, result in results.items():
+        before = (previous or {}).get(name)
+        change = ''
+        if before is not None:
+            change = '%+.0f%%' % ((result['mean_ms']/before['mean_ms'] - 1)*100)
+            if result['mean_ms'] > before['mean_ms']*regressionLimit:
+                change = change + ' SLOWER'
+                flagged.append(name)
+        print('%-45s %10.4f %10.4f %10s' % (name, result['mean_ms'], result['p99_ms'], change))
+    print('\nFrame loop p99 as a share of the frame budget (limit %s%%):' % int(frameBudgetShare*100))
+    for name, result in results.items():
+        if name.startswith('frame_'):
+            shares = [result['p99_ms']/(1000/hz) for hz in frameRates]
+            print('%-45s %s' % (name, '  '.join('%s Hz: %.1f%%%s' % (hz, share*100, ' OVER' if share > frameBudgetShare else '') for hz, share in zip(frameRates, shares))))
+            flagged.extend('%s@%sHz' % (name, hz) for hz, share in zip(frameRates, shares) if share > frameBudgetShare)
+    return flagged
+
+# Define gitCommit function
+#   Returns the current git commit (if available) so results can be matched to code changes
+def gitCommit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=_thisDir, capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='SeleST benchmarks')
+    parser.add_argument('--quick', action='store_true', help='run smaller benchmarks (e.g., to check that they run)')
+    parser.add_argument('--no-save', action='store_true', help='do not add results to the history file')
+    args = parser.parse_args()
+
+    history = []
+    if os.path.exists(historyFile):
+        with open(historyFile, 'r') as f:
+            history = json.load(f)
+    previous = [entry for entry in history if entry['quick'] == args.quick and entry.get('machine') == platform.node()
+        and entry.get('platform') == platform.platform()] # only compare with runs on the same computer
+    results = runBenchmarks(args.quick)
+    flagged = report(results, previous[-1]['results'] if previous else None)
+    if flagged:
+        print('\nFlagged: %s' % ', '.join(flagged))
+    if not args.no_save:
+        history.append({'date': time.strftime('%Y-%m-%d %H:%M:%S'), 'commit': gitCommit(), 'quick': args.quick, 'machine': platform.node(),
+            'platform': platform.platform(), 'python': platform.python_version(), 'numpy': np.__version__, 'results': results})
+        with open(historyFile, 'w') as f:
+            json.dump(history, f, indent=1)
+        print('Results saved to %s' % historyFile)
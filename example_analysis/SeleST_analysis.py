@@ -0,0 +1,172 @@
+"""
+Selective Stopping Toolbox (SeleST) analysis functions
+    Functions used to process SeleST data files (see SeleST_example_group_analysis.py for an example)
+
+    Trial outcomes are calculated for all trials at once from the press matrix (L_press, R_press, L2_press, R2_press),
+    trialType and Choice columns rather than trial-by-trial.
+
+"""
+
+import os
+import pickle
+import hashlib
+import inspect
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+
+pressCols = ['L_press', 'R_press', 'L2_press', 'R2_press'] # response columns in data files
+rtCols = ['L_RT', 'R_RT', 'L2_RT', 'R2_RT']
+
+# Response patterns (L, R, L2, R2) for each outcome
+noPress = np.array([0,0,0,0]) # successful stop-all trial
+goPatterns = np.array([[1,1,0,0],[0,0,1,1]]) # successful go trial for choice 1 and 2
+SLPatterns = np.array([[0,1,0,0],[0,0,0,1]]) # successful stop-left trial w/ right responses
+SRPatterns = np.array([[1,0,0,0],[0,0,1,0]]) # successful stop-right trial w/ left responses
+
+# Define matchesPattern function
+#   Returns boolean array that is True for trials (rows of presses) matching any of the response patterns
+def matchesPattern(presses, patterns):
+    patterns = np.atleast_2d(patterns)
+    return (presses[:,None,:] == patterns[None,:,:]).all(axis=2).any(axis=1)
+
+# Define classifyTrials function
+#   Adds go_success (nan for stop trials) and stop_success (nan for go trials) columns to data.
+#   Go trials are successful if both keys of the cued choice were pressed, stop-all trials if no keys were pressed, and
+#   partial stop trials if no keys were pressed or only the key of the non-stopped hand (of either choice) was pressed.
+def classifyTrials(data):
+    presses = data[pressCols].to_numpy()
+    trialType = data['trialType'].to_numpy()
+    choice = data['Choice'].to_numpy()
+
+    goSuccess = np.zeros(len(data))
+    for c, pattern in enumerate(goPatterns): # choices
+        goSuccess[(choice == c+1) & matchesPattern(presses, pattern)] = 1
+    goSuccess[trialType > 1] = np.nan
+
+    stopped = matchesPattern(presses, noPress)
+    stopSuccess = np.zeros(len(data))
+    stopSuccess[(trialType == 2) & stopped] = 1
+    stopSuccess[(trialType == 3) & (stopped | matchesPattern(presses, SLPatterns))] = 1
+    stopSuccess[(trialType == 4) & (stopped | matchesPattern(presses, SRPatterns))] = 1
+    stopSuccess[trialType == 1] = np.nan
+
+    data['go_success'] = goSuccess
+    data['stop_success'] = stopSuccess
+    return data
+
+# Define stoppingInterference function
+#   Returns the stopping-interference effect (ms) for every trial: RT of the responding hand on partial stop trials
+#   minus the mean go RT of that hand (goLeftRT, goRightRT). Go and stop-all trials are nan.
+def stoppingInterference(data, goLeftRT, goRightRT):
+    trialType = data['trialType'].to_numpy()
+    choice = data['Choice'].to_numpy()
+    si = np.full(len(data), np.nan)
+    for t, c, col, goRT in [(3,1,'R_RT',goRightRT), (3,2,'R2_RT',goRightRT), (4,1,'L_RT',goLeftRT), (4,2,'L2_RT',goLeftRT)]:
+        idx = (trialType == t) & (choice == c)
+        si[idx] = data[col].to_numpy()[idx] - goRT
+    return si
+
+# Define goRTs function
+#   Returns the go RT of every trial (mean RT of the two keys of the cued choice). Missing responses are given maxRT
+#   so that go omissions are included when estimating SSRT. Trials with any other choice are given 0.
+def goRTs(data, maxRT=1250):
+    presses = data[pressCols].to_numpy()
+    rts = np.where(presses == 0, maxRT, data[rtCols].to_numpy(dtype=float))
+    choice = data['Choice'].to_numpy()
+    goRT = np.zeros(len(data))
+    goRT[choice == 1] = rts[choice == 1][:,[0,1]].mean(axis=1)
+    goRT[choice == 2] = rts[choice == 2][:,[2,3]].mean(axis=1)
+    return goRT
+
+# Define integrationSSRT function
+#   Returns SSRT (ms) estimated with the integration method: the nth go RT minus the stop-signal delay, where n is the
+#   number of go trials multiplied by p(respond|signal). goRT should include go omissions given a maximum RT (see goRTs).
+#   For the anticipatory response task (ARI), give the target time (e.g., 800 ms) as targetTime and the stop-signal
+#   delay as the time before the target (abs(stopTime - targetTime)), SSRT is then transformed to targetTime - SSRT.
+def integrationSSRT(goRT, pRespond, ssd, targetTime=None):
+    goRT = np.asarray(goRT, dtype=float)
+    n = min(int(round(len(goRT)*pRespond)), len(goRT)-1) # index of nth go RT
+    ssrt = abs(np.partition(goRT, n)[n] - ssd)
+    if targetTime is not None:
+        ssrt = targetTime - ssrt
+    return ssrt
+
+# Define integrationSSRTs function
+#   Same as integrationSSRT for many sets of go RTs at once (e.g., bootstrap resamples or simulated participants):
+#   goRT is an array with one row per set and pRespond and ssd have one value per set. Returns one SSRT per set.
+def integrationSSRTs(goRT, pRespond, ssd, targetTime=None):
+    goRT = np.sort(np.asarray(goRT, dtype=float), axis=1)
+    n = np.minimum(np.round(goRT.shape[1]*np.asarray(pRespond)).astype(int), goRT.shape[1]-1) # index of nth go RT of each set
+    ssrt = abs(np.take_along_axis(goRT, n[:,None], axis=1)[:,0] - ssd)
+    if targetTime is not None:
+        ssrt = targetTime - ssrt
+    return ssrt
+
+# Define bootstrapSSRT function
+#   Returns the confidence interval (low, high) of the integration-method SSRT. Go trials (goRT) and stop trials
+#   (stopSuccess, stopTime) are resampled with replacement nBoot times, all resamples are processed as one array.
+#   stopTime is the raw stop-signal time of each stop trial, for ARI it is transformed using targetTime (see above).
+#   The mean stop-signal time of each resample is rounded to the nearest ms, as for the point estimate.
+def bootstrapSSRT(goRT, stopSuccess, stopTime, targetTime=None, nBoot=2000, ci=95, seed=None):
+    goRT = np.asarray(goRT, dtype=float)
+    stopSuccess = np.asarray(stopSuccess, dtype=float)
+    stopTime = np.asarray(stopTime, dtype=float)
+    rng = np.random.default_rng(seed)
+    goSamples = goRT[rng.integers(0, len(goRT), (nBoot, len(goRT)))] # resampled go RTs (nBoot x n go trials)
+    stopSamples = rng.integers(0, len(stopTime), (nBoot, len(stopTime))) # resampled stop trials (nBoot x n stop trials)
+    pRespond = 1 - stopSuccess[stopSamples].mean(axis=1)
+    ssd = np.round(stopTime[stopSamples].mean(axis=1)) # same rounding as the SSD of the point estimate (see SeleST_example_group_analysis.py)
+    if targetTime is not None:
+        ssd = abs(ssd - targetTime)
+    ssrt = integrationSSRTs(goSamples, pRespond, ssd, targetTime)
+    low, high = np.percentile(ssrt, [(100-ci)/2, 100-(100-ci)/2])
+    return float(low), float(high)
+
+# Define runFiles function
+#   Calls processFile(*job) for every job (e.g., one job per participant x paradigm data file) using a pool of nWorkers
+#   processes (None = all cores, 1 = no parallel processing). Results are returned in the same order as jobs, so
+#   combined output does not depend on which file finishes first. processFile must be defined at the top level of a
+#   script (or module) and the script must call runFiles within an if __name__ == '__main__': block.
+def runFiles(processFile, jobs, nWorkers=None):
+    jobs = list(jobs)
+    if nWorkers == 1 or len(jobs) < 2:
+        return [processFile(*job) for job in jobs]
+    with ProcessPoolExecutor(max_workers=nWorkers) as pool:
+        return list(pool.map(processFile, *zip(*jobs)))
+
+# Define fileHash function
+#   Returns the SHA-256 hash of the contents of a file
+def fileHash(fileName):
+    h = hashlib.sha256()
+    with open(fileName, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+# Define cachedRunFiles function
+#   Same as runFiles, but results are cached on disk (in cacheDir) so that only new or changed data files are processed.
+#   dataFiles gives the data file of each job. A result is reused if the contents of the data file, the job arguments,
+#   the source code of processFile, the source code of this script (the analysis functions processFile relies on) and
+#   version are all unchanged, so version should be changed whenever the analysis parameters or other functions
+#   processFile relies on are changed (e.g., version = 'v1 n_boot=2000').
+def cachedRunFiles(processFile, jobs, dataFiles, cacheDir, version, nWorkers=None):
+    jobs = list(jobs)
+    os.makedirs(cacheDir, exist_ok=True)
+    analysisHash = hashlib.sha256((repr(version) + inspect.getsource(processFile) + fileHash(__file__)).encode()).hexdigest()
+    cacheFiles = [os.path.join(cacheDir, hashlib.sha256((analysisHash + fileHash(f) + repr(job)).encode()).hexdigest() + '.pkl')
+        for job, f in zip(jobs, dataFiles)]
+    results = [None]*len(jobs)
+    for j, cacheFile in enumerate(cacheFiles): # load cached results
+        try:
+            with open(cacheFile, 'rb') as f:
+                results[j] = (pickle.load(f),)
+        except (OSError, pickle.UnpicklingError, EOFError): # not cached yet (or cache file is damaged)
+            pass
+    todo = [j for j in range(len(jobs)) if results[j] is None]
+    print('%s of %s data files loaded from cache, processing %s' % (len(jobs)-len(todo), len(jobs), len(todo)))
+    for j, result in zip(todo, runFiles(processFile, [jobs[j] for j in todo], nWorkers)): # process new/changed files
+        with open(cacheFiles[j] + '.tmp', 'wb') as f:
+            pickle.dump(result, f)
+        os.replace(cacheFiles[j] + '.tmp', cacheFiles[j])
+        results[j] = (result,)
+    return [result[0] for result in results]
@@ -0,0 +1,165 @@
+"""
+Selective Stopping Toolbox (SeleST) design simulation
+    Used when planning a study: how many blocks, stop trials and which SSD step size are needed to estimate SSRT and
+    stopping-interference (SI) precisely enough
+
+    Virtual participants perform the task according to an independent race model (the same model as the simulated
+    participant in lib/SeleST_headless.py): on every trial a go process finishes at a random time for each hand, and on
+    stop trials a stop process finishes SSRT after the stop signal. A hand responds if its go process finishes before
+    the stop process (for hands that are signalled to stop), and the remaining hand is slowed by SI on successful
+    partial stops. Blocks are built as in SeleST (same trial composition and order constraints, see lib/SeleST_trials.py),
+    stop-signal delays are staircased with the same rules and limits as SeleST_run.staircaseSSD, and SSRT and SI are
+    estimated as in SeleST_example_group_analysis.py. All virtual participants are simulated at once (one array
+    operation per trial position), so thousands of participants per design take a fraction of a second.
+
+    The bias and variability of the estimates (relative to the true SSRT and SI of each virtual participant) are
+    saved for every design to SeleST_simulation_results.csv.
+
+    Trial orders are made with the task's own code (lib/SeleST_trials.py), so run this script as a module from the
+    SeleST folder: python -m example_analysis.SeleST_simulation
+
+"""
+
+import os
+import numpy as np
+import pandas as pd
+from lib import SeleST_trials
+from example_analysis.SeleST_analysis import integrationSSRTs
+
+datafolder = os.path.dirname(os.path.realpath(__file__))
+
+n_participants = 2000 # number of virtual participants per design
+seed = 1 # seed for the simulation (so results can be reproduced)
+maxRT = 1250 # RT given to missing go responses when estimating SSRT (as in SeleST_example_group_analysis.py)
+
+# Task settings of each paradigm (same defaults as SeleST_initialize.Experiment)
+paradigmDefaults = {
+    'ARI': {'Target time (ms)': 800, 'Trial length (s)': 1.25, 'Stop-both time (ms)': 600, 'Stop-left time (ms)': 550,
+            'Stop-right time (ms)': 550, 'Lower stop-limit (ms)': 150, 'Upper stop-limit (ms)': 50},
+    'SST': {'Target time (ms)': 0, 'Trial length (s)': 1.25, 'Stop-both time (ms)': 175, 'Stop-left time (ms)': 175,
+            'Stop-right time (ms)': 175, 'Lower stop-limit (ms)': 50, 'Upper stop-limit (ms)': -500}}
+
+# Design settings (same names as the general settings of SeleST), designs below only need to give settings that differ
+designDefaults = {'Paradigm': 'SST', 'n go trials per block': 24, 'n stop-both trials per block': 4, 'n stop-left trials per block': 4,
+    'n stop-right trials per block': 4, 'n blocks': 12, 'n forced go trials': 3, 'Stop-signal delay step-size (ms)': 50,
+    'Include practice?': True}
+
+# Race model of the virtual participants (ms). goMean defaults to the target time for ARI and 450 ms for SST.
+#   Between-participant SDs give each virtual participant their own mean go RT and SSRT.
+modelDefaults = {'goMean': None, 'goBetweenSD': 40, 'goSD': 50, 'handSD': 10, 'ssrt': 220, 'ssrtBetweenSD': 30, 'ssrtSD': 30,
+    'stopInterference': 50, 'omissionRate': 0.01}
+
+# Designs to compare
+designs = [dict(Paradigm=p, **{'n blocks': b, 'Stop-signal delay step-size (ms)': step}) for p in ['SST', 'ARI'] for b in [4, 6, 8, 12] for step in [25, 50]]
+
+# Define simulateDesign function
+#   Simulates one session of a design for each of nParticipants virtual participants. Returns a data frame with one
+#   row per virtual participant with the true SSRT and SI of the participant and the estimates from the analysis.
+def simulateDesign(design, model=None, nParticipants=1000, rng=None):
+    design = dict(designDefaults, **design)
+    model = dict(modelDefaults, **(model or {}))
+    task = paradigmDefaults[design['Paradigm']]
+    rng = np.random.default_rng(rng)
+    P = nParticipants
+    targetTime = task['Target time (ms)'] if design['Paradigm'] == 'ARI' else None
+    goMean = model['goMean'] if model['goMean'] is not None else (task['Target time (ms)'] if design['Paradigm'] == 'ARI' else 450)
+    trialLength = task['Trial length (s)']*1000
+
+    # Trial order (go/stop practice block 0 is only used to staircase stop-signal delays, as in the task)
+    block = np.repeat([1, 2, 3, 4], [design['n go trials per block'], design['n stop-both trials per block'],
+        design['n stop-left trials per block'], design['n stop-right trials per block']]) # standard block (trial types)
+    nBlocks = design['n blocks'] + (design['Include practice?'] == True)
+    orders = SeleST_trials.blockOrders(block, nBlocks*P, randomise=True, nForcedGo=design['n forced go trials'], rng=rng)
+    trialType = block[orders].reshape(P, -1) # participant x trial
+    blockNumber = np.repeat(np.arange(nBlocks) + (design['Include practice?'] != True), len(block))
+    T = trialType.shape[1]
+
+    # Go and stop processes of every trial
+    trueSSRT = rng.normal(model['ssrt'], model['ssrtBetweenSD'], P)
+    goTime = rng.normal(goMean, model['goBetweenSD'], P)[:,None] + rng.normal(0, model['goSD'], (P, T)) # shared go process for both hands
+    goL = goTime + rng.normal(0, model['handSD'], (P, T))
+    goR = goTime + rng.normal(0, model['handSD'], (P, T))
+    respond = rng.random((P, T)) >= model['omissionRate']
+    stopProcess = trueSSRT[:,None] + rng.normal(0, model['ssrtSD'], (P, T)) # stop process finishes this long after the stop signal
+    stopLeft = np.isin(trialType, [2, 3])
+    stopRight = np.isin(trialType, [2, 4])
+
+    # Run the staircase trial by trial (all participants at once)
+    stopTimeArray = np.tile(np.array([0, task['Stop-both time (ms)'], task['Stop-left time (ms)'], task['Stop-right time (ms)']], dtype=float), (P, 1))
+    lowerLimit = task['Lower stop-limit (ms)']
+    upperLimit = task['Target time (ms)'] - task['Upper stop-limit (ms)']
+    step = design['Stop-signal delay step-size (ms)']
+    stopTime = np.zeros((P, T))
+    rows = np.arange(P)
+    for t in range(T):
+        staircase = trialType[:, t] - 1
+        stopTime[:, t] = stopTimeArray[rows, staircase]
+        stopFinish = stopTime[:, t] + stopProcess[:, t]
+        failL = stopLeft[:, t] & respond[:, t] & (goL[:, t] < stopFinish) & (goL[:, t] < trialLength) # stopped hand responded
+        failR = stopRight[:, t] & respond[:, t] & (goR[:, t] < stopFinish) & (goR[:, t] < trialLength)
+        success = ~(failL | failR)
+        isStop = staircase > 0
+        up = isStop & success & (stopTime[:, t] + step <= upperLimit) # same rules as SeleST_ssd.StaircasePolicy
+        down = isStop & ~success & (stopTime[:, t] - step >= lowerLimit)
+        stopTimeArray[rows, staircase] = stopTime[:, t] + step*up - step*down
+    stopTime[trialType == 1] = 0
+
+    # Key presses and RTs (ms)
+    stopFinish = stopTime + stopProcess
+    pressL = respond & (~stopLeft | (goL < stopFinish))
+    pressR = respond & (~stopRight | (goR < stopFinish))
+    partialStop = ((trialType == 3) & ~pressL) | ((trialType == 4) & ~pressR) # successful partial stops (remaining hand is slowed)
+    goL = goL + model['stopInterference']*partialStop
+    goR = goR + model['stopInterference']*partialStop
+    pressL = pressL & (goL < trialLength) & (goL > 0)
+    pressR = pressR & (goR < trialLength) & (goR > 0)
+    L_RT = np.where(pressL, goL, np.nan)
+    R_RT = np.where(pressR, goR, np.nan)
+    stopSuccess = np.where(trialType == 2, ~pressL & ~pressR, np.where(trialType == 3, ~pressL, ~pressR))
+
+    # Estimates (as in SeleST_example_group_analysis.py, task blocks only)
+    taskBlocks = blockNumber[None, :] > 0
+    goTrials = (trialType == 1) & taskBlocks
+    goSuccess = goTrials & pressL & pressR
+    goLeftRT = np.nanmean(np.where(goSuccess, L_RT, np.nan), axis=1)
+    goRightRT = np.nanmean(np.where(goSuccess, R_RT, np.nan), axis=1)
+    goRT = np.where(pressL, L_RT, maxRT)/2 + np.where(pressR, R_RT, maxRT)/2 # see SeleST_analysis.goRTs
+    goRT = goRT[goTrials].reshape(P, -1)
+    results = {'trueSSRT': trueSSRT, 'trueSI': np.full(P, float(model['stopInterference']))}
+    for label, trials in [('SA', (trialType == 2) & taskBlocks), ('PS', (trialType > 2) & taskBlocks)]:
+        success = np.round(np.sum(stopSuccess*trials, axis=1)/np.sum(trials, axis=1)*100, 2)
+        ssd = np.round(np.sum(stopTime*trials, axis=1)/np.sum(trials, axis=1))
+        if targetTime is not None:
+            ssd = abs(ssd - targetTime)
+        results[label + '_success'] = success
+        results[label + '_ssrt'] = integrationSSRTs(goRT, 1 - success/100, ssd, targetTime)
+    si = np.where(trialType == 3, R_RT - goRightRT[:,None], L_RT - goLeftRT[:,None]) # see SeleST_analysis.stoppingInterference
+    siTrials = (trialType > 2) & taskBlocks & stopSuccess
+    results['PS_si'] = np.round(np.sum(np.where(siTrials, si, 0), axis=1)/np.sum(siTrials, axis=1))
+    return pd.DataFrame(results)
+
+# Define summariseDesign function
+#   Returns the bias (mean estimate - true value), SD of the error (estimate - true value) and root-mean-square error
+#   of the SSRT and SI estimates
+def summariseDesign(design, sims):
+    design = dict(designDefaults, **design)
+    nTrials = design['n blocks']*sum(design[key] for key in ['n go trials per block', 'n stop-both trials per block', 'n stop-left trials per block', 'n stop-right trials per block'])
+    row = {'paradigm': design['Paradigm'], 'n_blocks': design['n blocks'], 'step_size': design['Stop-signal delay step-size (ms)'], 'n_trials': nTrials,
+        'n_stop_trials': design['n blocks']*(design['n stop-both trials per block'] + design['n stop-left trials per block'] + design['n stop-right trials per block'])}
+    for estimate, truth in [('SA_ssrt', 'trueSSRT'), ('PS_ssrt', 'trueSSRT'), ('PS_si', 'trueSI')]:
+        error = sims[estimate] - sims[truth]
+        row[estimate + '_bias'] = round(np.nanmean(error), 1)
+        row[estimate + '_sd'] = round(np.nanstd(error), 1) # precision of the estimate (differences in true values between participants are removed)
+        row[estimate + '_rmse'] = round(np.sqrt(np.nanmean(error**2)), 1)
+    row['SA_success'] = round(sims['SA_success'].mean(), 1)
+    row['PS_success'] = round(sims['PS_success'].mean(), 1)
+    return row
+
+if __name__ == '__main__':
+    rng = np.random.default_rng(seed)
+    results = pd.DataFrame([summariseDesign(design, simulateDesign(design, nParticipants=n_participants, rng=rng)) for design in designs])
+    print(results.to_string(index=False))
+
+    # save results
+    file = os.path.join(datafolder,'SeleST_simulation_results.csv')
+    results.to_csv(file,index=False)
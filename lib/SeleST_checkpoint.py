@@ -0,0 +1,188 @@
+"""
+Selective Stopping Toolbox (SeleST)
+
+    SeleST_checkpoint
+        Classes and functions for saving the state of a session after every trial and resuming it after a crash (or
+        after the task was quit with escape) can be found in this script
+
+        The checkpoint is an append-only file (*_checkpoint.jsonl next to the data file) with one line per event: the
+        settings of the session, the start of each block (trial order, choices and practice state), the end of each
+        trial (counters, scores, stop-signal delays and outcome) and the end of each block. The checkpoint is only
+        saved if 'Save checkpoints?' is selected in the advanced settings (and save data is selected). Selecting
+        'Resume session?' in the first GUI continues the last unfinished session of the participant (same participant
+        ID and experiment name) from the next trial, with the same settings, scores and stop-signal delays. Data are
+        added to the same data files.
+
+    See the SeleST.py script for general information on the task
+"""
+
+# Import required modules
+import os
+import glob
+import json
+import numpy as np
+from types import SimpleNamespace
+from lib import SeleST_data, SeleST_stats
+
+checkpointVersion = 1
+trialFiles = ['.txt', '_events.txt', '_frames.txt'] # data files with one or more rows per trial (trial number is the 2nd column)
+
+# Create Checkpoint class
+#   Writes the checkpoint of a session (see above). Lines are written by a SeleST_data.DataWriter, so writing a line
+#   after every trial does not delay the task. Each line is only written after the data queued before it (trial data,
+#   response events and frame timing), so the checkpoint never gets ahead of the data files. Only used if save data and save checkpoints are selected (always used
+#   when a session is resumed, so it can be resumed again).
+class Checkpoint:
+    def __init__(self, exp):
+        self.exp = exp
+        self.enabled = exp.taskInfo['Save data?'] == True and (exp.advSettings.get('Save checkpoints?') == True or exp.resume is not None)
+        if self.enabled:
+            self.writer = SeleST_data.DataWriter(exp.Output+'_checkpoint.jsonl')
+            self.dataWriters = [writer for writer in [exp.dataWriter, exp.eventWriter,
+                exp.frameLog.frameWriter if exp.frameLog.enabled else None] if writer is not None] # files with rows per trial (see trialFiles)
+            if exp.resume is None: # settings are only saved at the start of a new session
+                self.write({'type': 'session', 'version': checkpointVersion, 'taskInfo': exp.taskInfo,
+                    'genSettings': exp.genSettings, 'advSettings': exp.advSettings})
+
+    def write(self, record):
+        if self.enabled:
+            self.writer.writeAfter(json.dumps(record) + '\n', self.dataWriters)
+
+    # Save the trial order and choices of a block (called after SeleST_run.Block)
+    def startBlock(self, trialInfo, thisBlockTrials):
+        if not self.enabled:
+            return
+        imported = len(thisBlockTrials) > 0 and isinstance(thisBlockTrials[0], (dict, np.void)) # imported rows are taken from the trials file again (see Resume.restore)
+        self.write({'type': 'block', 'block': trialInfo.blockCount, 'trial': trialInfo.trialCount,
+            'trials': None if imported else [int(trial) for trial in thisBlockTrials],
+            'choices': [int(choice) for choice in trialInfo.choiceList],
+            'practiceGo': self.exp.practiceGo, 'practiceStop': self.exp.practiceStop})
+
+    # Save the state after a trial (called after SeleST_run.saveData)
+    def endTrial(self, trialInfo, stopInfo, thisTrial):
+        if not self.enabled:
+            return
+        self.write({'type': 'trial', 'block': trialInfo.blockCount, 'trial': trialInfo.trialCount, 'blockTrial': trialInfo.blockTrialCount,
+            'blockScore': trialInfo.blockScore, 'trialType': int(thisTrial.trialType), 'staircase': int(thisTrial.staircase),
+            'stopTime': thisTrial.stopTime, 'stopSuccess': thisTrial.stopSuccess, 'RTs': thisTrial.RTs,
+            'choice': int(trialInfo.choiceList[trialInfo.blockTrialCount-1]), 'stopTimeArray': list(stopInfo.stopTimeArray)})
+
+    # Save the scores at the end of a block (called by SeleST_run.endBlock)
+    def endBlock(self, trialInfo):
+        if not self.enabled:
+            return
+        self.write({'type': 'endBlock', 'block': trialInfo.blockCount, 'totalScore': trialInfo.totalScore,
+            'prevBlockScore': trialInfo.prevBlockScore})
+
+    # Mark the session as finished (it can then no longer be resumed)
+    def complete(self):
+        self.write({'type': 'complete'})
+
+    def close(self):
+        if self.enabled:
+            self.writer.close()
+
+# Define findCheckpoint function
+#   Returns the checkpoint file of the last unfinished session of a participant (most recently changed file)
+def findCheckpoint(_thisDir, participant, experiment):
+    pattern = os.path.join(_thisDir, 'data', glob.escape('SeleST_%s_%s_' % (participant, experiment)) + '*_checkpoint.jsonl')
+    for fileName in sorted(glob.glob(pattern), key=os.path.getmtime, reverse=True):
+        records = loadRecords(fileName)
+        if records and records[-1]['type'] != 'complete':
+            return fileName
+    raise FileNotFoundError('No unfinished session to resume for participant %s (experiment %s) in %s (sessions can only be resumed '
+        'if save checkpoints was selected in the advanced settings)' % (participant, experiment, os.path.join(_thisDir, 'data')))
+
+# Define loadRecords function
+#   Returns the records of a checkpoint file. A damaged last line (e.g., if the computer lost power while writing it)
+#   is ignored.
+def loadRecords(fileName):
+    records = []
+    with open(fileName, 'r') as f:
+        for line in f:
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                break
+    return records
+
+# Define trimTrials function
+#   Removes rows of trials after lastTrial from a data file (trials that finished after the last checkpoint line was
+#   written, these are run again when the session is resumed)
+def trimTrials(fileName, lastTrial):
+    if not os.path.exists(fileName):
+        return
+    with open(fileName, 'r') as f:
+        lines = f.readlines()
+    keep = lines[:1] + [line for line in lines[1:] if line.strip() and int(line.split()[1]) <= lastTrial]
+    if len(keep) < len(lines):
+        with open(fileName + '.tmp', 'w') as f:
+            f.writelines(keep)
+        os.replace(fileName + '.tmp', fileName)
+
+# Create Resume class
+#   Loads the checkpoint of an unfinished session (see findCheckpoint) and restores its state. Created by Experiment
+#   when 'Resume session?' is selected, the settings of the session are then used instead of the GUIs.
+class Resume:
+    def __init__(self, fileName):
+        self.fileName = fileName
+        self.records = loadRecords(fileName)
+        session = self.records[0]
+        if session['type'] != 'session' or session['version'] != checkpointVersion:
+            raise ValueError('Checkpoint file %s cannot be resumed by this version of SeleST' % fileName)
+        self.taskInfo = session['taskInfo']
+        self.genSettings = session['genSettings']
+        self.advSettings = session['advSettings']
+        trials = [record for record in self.records if record['type'] == 'trial']
+        self.lastTrial = trials[-1]['trial'] if trials else 0
+        print('Resuming session %s after trial %s' % (os.path.basename(fileName)[:-len('_checkpoint.jsonl')], self.lastTrial))
+
+    # Remove rows of trials that are not in the checkpoint from the data files (called before the files are opened)
+    def trimDataFiles(self, output):
+        for suffix in trialFiles:
+            trimTrials(output + suffix, self.lastTrial)
+        if self.advSettings['Save binary (.npy) data?'] == True: # rebuild typed data from the text data (.npy is only saved at the end of each block)
+            SeleST_data.convertTextFile(output + '.txt', output + '.npy')
+
+    # Restore counters, scores, choices, stop-signal delays (including the state of the SSD policy) and running
+    # statistics. Returns the blocks still to run and the remaining trials of the interrupted block (None if the
+    # last block was finished), see SeleST_run.runTask.
+    def restore(self, exp, trialInfo, stopInfo):
+        blocks = [r for r in self.records if r['type'] == 'block']
+        if not blocks: # interrupted before the first block started
+            return trialInfo.blockList, None
+        lastBlock = blocks[-1]
+        finished = self.records[-1]['type'] == 'endBlock' and self.records[-1]['block'] == lastBlock['block']
+        trialInfo.blockCount = lastBlock['block']
+        trialInfo.trialCount = lastBlock['trial']
+        trialInfo.blockTrialCount = 0
+        trialInfo.choiceList = lastBlock['choices']
+        exp.practiceGo = lastBlock['practiceGo']
+        exp.practiceStop = lastBlock['practiceStop']
+        scratch = list(stopInfo.stopTimeArray) # the SSD policy is updated with every stop outcome so its state is restored too
+        for record in self.records:
+            if record['type'] == 'trial':
+                if record['trialType'] > 1 and exp.genSettings['Staircase stop-signal delays?'] == True:
+                    stopInfo.policy.update(scratch, record['staircase'], record['stopSuccess'], record['stopTime'])
+                exp.sessionStats.update(SimpleNamespace(choiceList=[record['choice']], blockTrialCount=1, blockCount=record['block']),
+                    SimpleNamespace(stopTimeArray=record['stopTimeArray']), SimpleNamespace(**record))
+                for i, ssd in enumerate(record['stopTimeArray']): # stop-signal delays after the last trial
+                    stopInfo.stopTimeArray[i] = ssd
+                if record['block'] == lastBlock['block'] and record['trial'] > lastBlock['trial']:
+                    trialInfo.trialCount = record['trial']
+                    trialInfo.blockTrialCount = record['blockTrial']
+                    trialInfo.blockScore = record['blockScore']
+            elif record['type'] == 'endBlock':
+                exp.sessionStats.block = SeleST_stats.TrialStats() # block statistics start again
+                trialInfo.totalScore = record['totalScore']
+                trialInfo.prevBlockScore = record['prevBlockScore']
+                trialInfo.blockScore = 0
+        nStarted = len(blocks)
+        if finished:
+            return trialInfo.blockList[nStarted:], None
+        if lastBlock['trials'] is None: # imported trials (same block of the trials file as in SeleST_run.Block, including the practice go/stop block)
+            thisBlockTrials = trialInfo.blockTrials[trialInfo.blockCount-1]
+        else:
+            thisBlockTrials = lastBlock['trials']
+        print('Continuing block %s from trial %s' % (trialInfo.blockCount, trialInfo.blockTrialCount+1))
+        return trialInfo.blockList[nStarted-1:], thisBlockTrials[trialInfo.blockTrialCount:]
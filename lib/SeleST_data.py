@@ -0,0 +1,219 @@
+"""
+Selective Stopping Toolbox (SeleST)
+
+    SeleST_data
+        Classes and functions for writing task data to file (and loading it again) can be found in this script
+
+        Trial data can also be saved as a typed (binary) NumPy .npy file next to the .txt file (see ArrayWriter).
+        Existing .txt files can be converted by running this script, e.g.: python lib/SeleST_data.py data/*.txt
+
+    See the SeleST.py script for general information on the task
+"""
+
+# Import required modules
+import os
+import queue
+import atexit
+import sys
+import threading
+import numpy as np
+
+# Create DataWriter class
+#   Lines of data are queued by the task and written to file by a background thread, so that file-system
+#   stalls (e.g., antivirus scans or network drives) do not delay the next trial. Queued lines are written in
+#   batches and handed to the operating system straight away, so no records are lost if Python crashes.
+#   sync() additionally forces the file to disk (called at the end of each block) and close() drains the
+#   queue before closing the file (called at the end of the task, and automatically when Python exits).
+#   writeAfter() queues a line that is only written once the lines already queued by other writers have been written
+#   (used for the checkpoint, so it never describes trials whose data are not in the data files yet).
+class DataWriter:
+    def __init__(self, fileName, header=None, mode='a'):
+        self.fileName = fileName
+        self.file = open(fileName, mode)
+        if header is not None and self.file.tell() == 0: # write header straight away so the file is valid even if no trials are run (only for new files)
+            self.file.write(header)
+            self.file.flush()
+            os.fsync(self.file.fileno())
+        self.queue = queue.Queue() # lines waiting to be written
+        self.error = None # stores any error raised by the background thread
+        self.closed = False
+        self.thread = threading.Thread(target=self._run, name='SeleST_DataWriter', daemon=True)
+        self.thread.start()
+        atexit.register(self.close) # make sure queued lines are written if the task exits unexpectedly
+
+    # Queue a line (or several lines) to be written to file
+    def write(self, line):
+        if self.error is not None:
+            raise self.error
+        if self.closed:
+            raise ValueError('Cannot write to closed data file %s' % self.fileName)
+        self.queue.put(line)
+
+    # Queue a line that is written once all lines queued so far by the given writers have been written (the line is
+    # passed from one writer's background thread to the next, so lines queued with writeAfter stay in order)
+    def writeAfter(self, line, writers):
+        if not writers:
+            self.write(line)
+        else:
+            writers[0].call(self.writeAfter, line, writers[1:])
+
+    # Queue a function that is called by the background thread once all lines queued before it have been written
+    def call(self, function, *args):
+        if self.error is not None:
+            raise self.error
+        if self.closed:
+            raise ValueError('Cannot write to closed data file %s' % self.fileName)
+        self.queue.put((function, args))
+
+    # Wait until all queued lines have been written and force them to disk
+    def sync(self):
+        if self.closed:
+            return
+        done = threading.Event()
+        self.queue.put(done)
+        done.wait()
+        if self.error is not None:
+            raise self.error
+
+    # Write any remaining lines, force them to disk and close the file
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        self.queue.put(None) # None tells the background thread to finish
+        self.thread.join()
+        self.file.close()
+        atexit.unregister(self.close)
+
+    # Background thread: write queued lines in batches
+    def _run(self):
+        finished = False
+        while not finished:
+            batch = [self.queue.get()] # wait for the next item...
+            while True: # ...then grab everything else that is already waiting
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            lines = [item for item in batch if isinstance(item, str)]
+            syncRequests = [item for item in batch if isinstance(item, threading.Event)]
+            calls = [item for item in batch if isinstance(item, tuple)]
+            finished = None in batch
+            try:
+                if lines:
+                    self.file.write(''.join(lines))
+                    self.file.flush() # hand data to the operating system so a crash of the task does not lose it
+                if syncRequests or finished:
+                    os.fsync(self.file.fileno())
+            except OSError as e:
+                self.error = e
+            for function, args in calls: # lines queued before these calls have now been written
+                try:
+                    function(*args)
+                except (OSError, ValueError) as e:
+                    self.error = e
+            for done in syncRequests: # release anyone waiting on sync()
+                done.set()
+
+# Columns (and their types) of the trial data, in the same order as the .txt data file
+trialFields = [('block', 'i2'), ('trial', 'i4'), ('startTime', 'f8'), ('trialName', 'U16'), ('trialType', 'i1'),
+    ('stopTime', 'i4'), ('L_targetTime', 'f8'), ('R_targetTime', 'f8'), ('Choice', 'i1'), ('L_press', 'i1'),
+    ('R_press', 'i1'), ('L2_press', 'i1'), ('R2_press', 'i1'), ('L_RT', 'f8'), ('R_RT', 'f8'), ('L2_RT', 'f8'), ('R2_RT', 'f8')]
+trialDtype = np.dtype(trialFields)
+
+# Create ArrayWriter class
+#   Stores trial data (one record per trial, see trialFields) in a structured NumPy array and saves it as a .npy
+#   file. The file is rewritten at every sync() (end of each block) and close() rather than after every trial, as
+#   the .npy format stores the number of records in its header. Files are written to a temporary file first and
+#   then renamed, so the .npy file always contains the complete data of the last block that was saved.
+#   With append=True, records already in the file are kept (e.g., when a session is resumed).
+class ArrayWriter:
+    def __init__(self, fileName, capacity=512, append=False):
+        self.fileName = fileName
+        self.records = np.zeros(capacity, dtype=trialDtype)
+        self.nRecords = 0
+        if append and os.path.exists(fileName):
+            existing = np.load(fileName)
+            self.records = np.zeros(max(capacity, 2*len(existing)), dtype=trialDtype)
+            self.records[:len(existing)] = existing
+            self.nRecords = len(existing)
+        self.closed = False
+        self.sync() # create file straight away (with no trials) so it exists even if no trials are run
+        atexit.register(self.close)
+
+    # Add a record (tuple of values in the order of trialFields)
+    def write(self, record):
+        if self.closed:
+            raise ValueError('Cannot write to closed data file %s' % self.fileName)
+        if self.nRecords == len(self.records): # grow array if needed
+            self.records = np.concatenate([self.records, np.zeros(len(self.records), dtype=trialDtype)])
+        self.records[self.nRecords] = record
+        self.nRecords = self.nRecords + 1
+
+    # Save all records to file
+    def sync(self):
+        if self.closed:
+            return
+        with open(self.fileName + '.tmp', 'wb') as f:
+            np.save(f, self.records[:self.nRecords])
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(self.fileName + '.tmp', self.fileName)
+
+    # Save all records and close
+    def close(self):
+        if self.closed:
+            return
+        self.sync()
+        self.closed = True
+        atexit.unregister(self.close)
+
+# Define loadSession function
+#   Returns the trial data of a session as a structured array (columns are accessed by name, e.g. data['L_RT']).
+#   The .npy file is memory-mapped, so data are only read from disk when used. If a .txt data file is given, the .npy
+#   file next to it is loaded (and created from the .txt file first if it does not exist yet, see convertTextFile).
+#   Use pandas.DataFrame(loadSession(fileName)) to get the same data frame as pandas.read_csv(txtFile, delimiter=' ').
+def loadSession(fileName, mmap=True):
+    if fileName.endswith('.txt'):
+        npyFile = fileName[:-4] + '.npy'
+        if not os.path.exists(npyFile):
+            convertTextFile(fileName, npyFile)
+        fileName = npyFile
+    return np.load(fileName, mmap_mode='r' if mmap else None)
+
+# Define convertTextFile function
+#   Converts a .txt data file to a .npy file (saved next to it unless npyFile is given) and returns the .npy file name
+def convertTextFile(txtFile, npyFile=None):
+    if npyFile is None:
+        npyFile = os.path.splitext(txtFile)[0] + '.npy'
+    with open(txtFile, 'r') as f:
+        header = f.readline().split()
+        rows = [line.split() for line in f if line.strip()]
+    records = np.zeros(len(rows), dtype=trialDtype)
+    for c, name in enumerate(header): # fill array column by column (numpy converts text to the type of each column)
+        if name in trialDtype.names:
+            column = [row[c] for row in rows]
+            if trialDtype[name].kind in 'iu':
+                column = np.array(column, dtype='f8') # allows values such as '800.0' in integer columns
+            records[name] = column
+    with open(npyFile + '.tmp', 'wb') as f:
+        np.save(f, records)
+    os.replace(npyFile + '.tmp', npyFile)
+    return npyFile
+
+# Define loadEvents function
+#   Returns the response events of a session (*_events.txt, see SeleST_run.saveData) as a structured array with one row
+#   per key-down or key-up event: block, trial, respIndex (0 = L, 1 = R, 2 = L2, 3 = R2), key, event ('down' or 'up')
+#   and time (ms relative to trial onset, negative if the key was pressed before trial onset)
+def loadEvents(fileName):
+    eventDtype = np.dtype([('block', 'i2'), ('trial', 'i4'), ('respIndex', 'i1'), ('key', 'U16'), ('event', 'U4'), ('time', 'f8')])
+    with open(fileName, 'r') as f:
+        f.readline() # skip header
+        rows = [tuple(line.split()) for line in f if line.strip()]
+    return np.array(rows, dtype=eventDtype) if rows else np.zeros(0, dtype=eventDtype)
+
+# Convert .txt data files given on the command line (e.g., an existing data archive) to .npy files
+if __name__ == '__main__':
+    for txtFile in sys.argv[1:]:
+        if txtFile.endswith('.txt') and not txtFile.endswith(('_taskInfo.txt', '_frames.txt', '_frameSummary.txt', '_events.txt')):
+            print('%s -> %s' % (txtFile, convertTextFile(txtFile)))
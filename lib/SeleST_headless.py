@@ -0,0 +1,418 @@
+"""
+Selective Stopping Toolbox (SeleST)
+
+    SeleST_headless
+        Classes and functions for running SeleST without a display, keyboard or GUIs can be found in this script.
+        Whole sessions are run in virtual time with a simulated participant (independent race model), producing the
+        same data files as a real session. This is useful for checking trials files and staircase settings, and for
+        measuring the overhead of the task code itself.
+
+        e.g.
+            from lib import SeleST_headless
+            result = SeleST_headless.runHeadless(_thisDir, taskInfo={'Paradigm': 'SST', 'Include practice?': False})
+
+    See the SeleST.py script for general information on the task
+"""
+
+# Import required modules
+import os
+import sys
+import time
+import types
+import random
+import importlib
+import contextlib
+
+# Install placeholders for PsychoPy modules that cannot be imported without a display or the relevant hardware.
+#   These are never used in headless mode as they are replaced with the virtual versions below.
+def _installPlaceholders():
+    for name in ['psychopy.visual', 'psychopy.event', 'psychopy.gui', 'psychopy.hardware.keyboard']:
+        try:
+            importlib.import_module(name)
+        except Exception:
+            _placeholder(name)
+
+def _placeholder(name):
+    module = types.ModuleType(name)
+    sys.modules[name] = module
+    if '.' in name: # attach to parent module (which may also need a placeholder)
+        parent, child = name.rsplit('.', 1)
+        try:
+            parentModule = importlib.import_module(parent)
+        except Exception:
+            parentModule = _placeholder(parent)
+        setattr(parentModule, child, module)
+    return module
+
+_installPlaceholders()
+from lib import SeleST_initialize, SeleST_run, SeleST_session
+
+# Create SessionEnded class
+#   Raised instead of quitting Python when the task calls core.quit() in headless mode
+class SessionEnded(Exception):
+    pass
+
+# Create VirtualTime class
+#   Keeps track of virtual time (s). Time only moves forward when the task waits, polls for keys or flips the window.
+class VirtualTime:
+    def __init__(self):
+        self.now = 0.0
+
+    def advance(self, secs):
+        self.now = self.now + max(secs, 0)
+
+# Create VirtualClock and VirtualCountdownTimer classes
+#   Stand in for core.Clock and core.CountdownTimer
+class VirtualClock:
+    def __init__(self, vt):
+        self.vt = vt
+        self._timeAtLastReset = vt.now
+
+    def getTime(self):
+        return self.vt.now - self._timeAtLastReset
+
+    def reset(self, newT=0.0):
+        self._timeAtLastReset = self.vt.now + newT
+
+    def getLastResetTime(self):
+        return self._timeAtLastReset
+
+class VirtualCountdownTimer(VirtualClock):
+    def __init__(self, vt, start=0):
+        VirtualClock.__init__(self, vt)
+        self._countdownTime = start
+
+    def getTime(self):
+        return self._countdownTime - (self.vt.now - self._timeAtLastReset)
+
+    def reset(self, t=None):
+        VirtualClock.reset(self)
+        if t is not None:
+            self._countdownTime = t
+
+# Create virtual versions of the PsychoPy modules used by the task
+class VirtualCore:
+    def __init__(self, vt):
+        self.vt = vt
+
+    def Clock(self):
+        return VirtualClock(self.vt)
+
+    def CountdownTimer(self, start=0):
+        return VirtualCountdownTimer(self.vt, start)
+
+    def getTime(self):
+        return self.vt.now
+
+    def wait(self, secs, hogCPUperiod=0.2):
+        self.vt.advance(secs)
+
+    def quit(self):
+        raise SessionEnded()
+
+class VirtualEvent:
+    def __init__(self, responder):
+        self.responder = responder
+
+    def getKeys(self, keyList=None, **kwargs):
+        return self.responder.eventKeys(keyList)
+
+    def clearEvents(self, eventType=None):
+        pass
+
+# Create NullStim class
+#   Accepts the same arguments as PsychoPy stimuli, stores attributes and draws nothing
+class NullStim:
+    def __init__(self, win=None, **kwargs):
+        self.win = win
+        self.autoDraw = False
+        for key, value in kwargs.items():
+            setattr(self, key, value)
+
+    def setAutoDraw(self, value):
+        self.autoDraw = value
+
+    def draw(self, win=None):
+        pass
+
+# Create NullWindow class
+#   Stands in for visual.Window. Each flip advances virtual time to the next frame at the given frame rate.
+class NullWindow:
+    def __init__(self, vt, frameRate=60.0, **kwargs):
+        self.vt = vt
+        self.frameRate = frameRate
+        self.frameDur = 1.0/frameRate
+        self.units = kwargs.get('units', 'cm')
+        self.size = kwargs.get('size', [1200, 1200])
+        self.color = kwargs.get('color', 'grey')
+        self.nFlips = 0
+        self._toCall = []
+
+    def flip(self, clearBuffer=True):
+        self.vt.now = (int(self.vt.now/self.frameDur + 1e-9) + 1)*self.frameDur # wait for next frame
+        for function, args, kwargs in self._toCall:
+            function(*args, **kwargs)
+        self._toCall = []
+        self.nFlips = self.nFlips + 1
+        return self.vt.now
+
+    def callOnFlip(self, function, *args, **kwargs):
+        self._toCall.append((function, args, kwargs))
+
+    def getActualFrameRate(self, *args, **kwargs):
+        return self.frameRate
+
+    def clearBuffer(self, *args, **kwargs):
+        pass
+
+    def close(self):
+        pass
+
+class VirtualVisual:
+    Rect = Line = TextStim = ImageStim = NullStim
+
+# Create SimKey class
+#   Mimics the key presses returned by psychopy.hardware.keyboard (compares equal to the key name)
+class SimKey:
+    def __init__(self, name, rt, duration=None):
+        self.name = name
+        self.rt = rt
+        self.duration = duration
+
+    def __eq__(self, other):
+        if isinstance(other, SimKey):
+            other = other.name
+        return self.name == other
+
+    def __hash__(self):
+        return hash(self.name)
+
+    def __repr__(self):
+        return 'SimKey(%s, rt=%s, duration=%s)'%(self.name, self.rt, self.duration)
+
+# Create ResponderClock class
+#   Clock of the simulated responder, which marks the start of the trial when it is reset at trial onset
+class ResponderClock(VirtualClock):
+    def __init__(self, vt, responder):
+        VirtualClock.__init__(self, vt)
+        self.responder = responder
+
+    def reset(self, newT=0.0):
+        VirtualClock.reset(self, newT)
+        self.responder.trialStarted = True
+
+# Create SimulatedResponder class
+#   Stands in for the keyboard (exp.rb) and responds according to an independent race model: on each trial a go
+#   process finishes at a random time for each responding hand, and on stop trials a stop process finishes
+#   SSRT after the stop signal. A hand responds if its go process finishes before the stop process (for hands
+#   that are signalled to stop), and the remaining hand is slowed by stopInterference on successful partial stops.
+#   Times are in seconds relative to trial onset. goMean defaults to the target time for ARI and 0.45 s for SST.
+class SimulatedResponder:
+    def __init__(self, vt, goMean=None, goSD=0.05, handSD=0.01, ssrt=0.22, ssrtSD=0.03, stopInterference=0.05,
+                 omissionRate=0.01, pressLead=0.5, seed=None):
+        self.vt = vt
+        self.clock = ResponderClock(vt, self) # reset at trial onset (see SeleST_run.runTask)
+        self.goMean = goMean
+        self.goSD = goSD
+        self.handSD = handSD
+        self.ssrt = ssrt
+        self.ssrtSD = ssrtSD
+        self.stopInterference = stopInterference
+        self.omissionRate = omissionRate
+        self.pressLead = pressLead # how long keys are held before trial onset in hold-and-release
+        self.rng = random.Random(seed)
+        self.keyNames = []
+        self.holdAndRelease = False
+        self.planned = [] # planned key presses for the current trial
+        self.trialStarted = False # planned key presses are only made after trial onset
+        self.holding = False
+        self.pollInterval = 0.001 # virtual time that passes each time keys are checked outside of flips
+
+    # Plan responses for the upcoming trial (called in headless mode after Start_Trial)
+    def prepareTrial(self, exp, trialInfo, thisTrial, trialStimuli):
+        self.keyNames = [exp.L_resp_key, exp.R_resp_key, exp.L2_resp_key, exp.R2_resp_key]
+        self.holdAndRelease = exp.taskInfo['Response mode'] == 'Hold-and-release'
+        self.holding = False
+        self.trialStarted = False
+        self.planned = []
+        if exp.taskInfo['RT type'] == 'Simple' or trialInfo.choiceList[trialInfo.blockTrialCount-1] == 1:
+            hands = [0, 1] # L & R
+        else:
+            hands = [2, 3] # L2 & R2
+        if self.goMean is not None:
+            goMean = self.goMean
+        elif exp.taskInfo['Paradigm'] == 'ARI':
+            goMean = thisTrial.L_targetTime/1000
+        else:
+            goMean = 0.45
+        if self.rng.random() < self.omissionRate: # no response on this trial
+            return
+        goTime = self.rng.gauss(goMean, self.goSD) # shared go process for both hands
+        goTimes = [goTime + self.rng.gauss(0, self.handSD) for h in hands]
+        stopLeft = thisTrial.trialType in [2, 3]
+        stopRight = thisTrial.trialType in [2, 4]
+        stopTime = thisTrial.stopTime/1000 + self.rng.gauss(self.ssrt, self.ssrtSD) # finishing time of stop process
+        respond = [not stopLeft or goTimes[0] < stopTime, not stopRight or goTimes[1] < stopTime]
+        if thisTrial.trialType in [3, 4] and not all(respond): # slow the remaining hand on successful partial stops
+            goTimes = [t + self.stopInterference for t in goTimes]
+        for i, h in enumerate(hands):
+            if respond[i] and goTimes[i] > 0:
+                if self.holdAndRelease: # keys are released, with press times before trial onset
+                    self.planned.append(SimKey(self.keyNames[h], -self.pressLead, goTimes[i] + self.pressLead))
+                else:
+                    self.planned.append(SimKey(self.keyNames[h], goTimes[i]))
+
+    # Keys pressed via psychopy.event (used to start hold-and-release trials and to continue after block breaks)
+    def eventKeys(self, keyList=None):
+        self.vt.advance(self.pollInterval)
+        if keyList is not None: # e.g., waiting for space
+            return list(keyList) if isinstance(keyList, (list, tuple)) else [keyList]
+        if self.holdAndRelease and not self.holding and self.keyNames: # press response keys to start trial
+            self.holding = True
+            return self.keyNames[:2]
+        return []
+
+    # Keyboard functions used by the task
+    def getKeys(self, keyList=None, waitRelease=False, clear=True):
+        if not self.trialStarted:
+            return []
+        t = self.clock.getTime()
+        keys = []
+        for key in self.planned:
+            if keyList is not None and key.name not in keyList:
+                continue
+            if waitRelease and (key.duration is None or key.rt + key.duration > t):
+                continue
+            if key.rt > t:
+                continue
+            keys.append(key)
+        if clear: # keys are only returned once
+            self.planned = [key for key in self.planned if not any(key is k for k in keys)]
+        return keys
+
+    def waitKeys(self, keyList=None, **kwargs):
+        self.vt.advance(self.pollInterval)
+        return [SimKey(keyList[0] if keyList else 'space', 0.0)]
+
+    def clearEvents(self, eventType=None):
+        pass
+
+# Create Experiment_headless class
+#   Same as SeleST_initialize.Experiment, but uses a null window (at the given frame rate) and the simulated
+#   responder instead of a window and keyboard. GUIs are not shown.
+class Experiment_headless(SeleST_initialize.Experiment):
+    def __init__(self, _thisDir, vt, responder, frameRate=60.0, taskInfo=None, genSettings=None, advSettings=None, shared=None):
+        self.vt = vt
+        self.responder = responder
+        self.simFrameRate = frameRate
+        advSettings = dict({'Collect responses in background?': False}, **(advSettings or {})) # poll responses in virtual time
+        SeleST_initialize.Experiment.__init__(self, _thisDir, taskInfo=taskInfo, genSettings=genSettings,
+            advSettings=advSettings, showGUI=False, shared=shared)
+
+    def setupDisplay(self):
+        self.win = NullWindow(self.vt, self.simFrameRate)
+        self.taskInfo['frameRate'] = self.simFrameRate
+        self.frameRate = self.simFrameRate
+        self.frameDur = 1.0 / round(self.frameRate) * 1000
+
+    def setupInput(self):
+        self.rb = self.responder
+        self.L_resp_key = self.advSettings['Left response key']
+        self.R_resp_key = self.advSettings['Right response key']
+        self.L2_resp_key = self.advSettings['Left 2 response key']
+        self.R2_resp_key = self.advSettings['Right 2 response key']
+
+# Replace PsychoPy modules used by SeleST_initialize and SeleST_run with their virtual versions (restored on exit)
+@contextlib.contextmanager
+def virtualPsychoPy(vt, responder):
+    core = VirtualCore(vt)
+    replacements = [
+        (SeleST_initialize, 'core', core),
+        (SeleST_initialize, 'visual', VirtualVisual()),
+        (SeleST_session, 'visual', VirtualVisual()),
+        (SeleST_run, 'core', core),
+        (SeleST_run, 'event', VirtualEvent(responder))]
+    originalStartTrial = SeleST_run.Start_Trial
+    def Start_Trial(exp, stimuli, trialInfo, thisTrial, trial): # plan simulated responses once the trial is set up
+        trialStimuli = originalStartTrial(exp, stimuli, trialInfo, thisTrial, trial)
+        responder.prepareTrial(exp, trialInfo, thisTrial, trialStimuli)
+        return trialStimuli
+    replacements.append((SeleST_run, 'Start_Trial', Start_Trial))
+    originals = [(module, name, getattr(module, name)) for module, name, value in replacements]
+    try:
+        for module, name, value in replacements:
+            setattr(module, name, value)
+        yield core
+    finally:
+        for module, name, value in originals:
+            setattr(module, name, value)
+
+# Define runHeadless function
+#   Runs a complete session without a display and returns a summary of the run. Settings are passed as for
+#   SeleST_initialize.Experiment, and responder settings (see SimulatedResponder) can be passed as responderSettings.
+#   Console output from the task is hidden unless verbose is True.
+def runHeadless(_thisDir, taskInfo=None, genSettings=None, advSettings=None, frameRate=60.0, responderSettings=None, verbose=False):
+    vt = VirtualTime()
+    responder = SimulatedResponder(vt, **(responderSettings or {}))
+    output = sys.stdout if verbose else open(os.devnull, 'w')
+    wallStart = time.perf_counter()
+    try:
+        with virtualPsychoPy(vt, responder), contextlib.redirect_stdout(output):
+            exp = Experiment_headless(_thisDir, vt, responder, frameRate, taskInfo, genSettings, advSettings)
+            stimuli = SeleST_initialize.Stimuli(exp)
+            trialInfo = SeleST_initialize.Trials(exp)
+            stopInfo = SeleST_initialize.SSD(exp)
+            trialStimuli = SeleST_run.runTask(exp, stimuli, trialInfo, stopInfo)
+            try:
+                SeleST_run.endTask(exp, stimuli, trialStimuli)
+            except SessionEnded:
+                pass
+    finally:
+        if output is not sys.stdout:
+            output.close()
+    wallTime = time.perf_counter() - wallStart
+    return {
+        'output': getattr(exp, 'Output', None), # data file (without .txt extension)
+        'nTrials': trialInfo.trialCount,
+        'nFrames': exp.win.nFlips,
+        'virtualTime': vt.now, # duration of the session in virtual time (s)
+        'wallTime': wallTime, # time taken to run the session (s)
+        'wallTimePerTrial': wallTime/max(trialInfo.trialCount, 1),
+        'stopTimeArray': list(stopInfo.stopTimeArray)}
+
+# Define runHeadlessSession function
+#   Runs several paradigms in one session without a display (see SeleST_session.runSession) and returns a summary of
+#   the run. The same simulated participant is used for all paradigms.
+def runHeadlessSession(_thisDir, configs, taskInfo=None, genSettings=None, advSettings=None, frameRate=60.0, responderSettings=None, verbose=False):
+    vt = VirtualTime()
+    responder = SimulatedResponder(vt, **(responderSettings or {}))
+    experiments = [] # experiment of each paradigm
+    def Experiment(_thisDir, showGUI=False, shared=None, **settings):
+        experiments.append(Experiment_headless(_thisDir, vt, responder, frameRate, shared=shared, **settings))
+        return experiments[-1]
+    output = sys.stdout if verbose else open(os.devnull, 'w')
+    wallStart = time.perf_counter()
+    try:
+        with virtualPsychoPy(vt, responder), contextlib.redirect_stdout(output):
+            try:
+                SeleST_session.runSession(_thisDir, configs, taskInfo, genSettings, advSettings, showGUI=False, Experiment=Experiment)
+            except SessionEnded:
+                pass
+    finally:
+        if output is not sys.stdout:
+            output.close()
+    return {
+        'outputs': [getattr(exp, 'Output', None) for exp in experiments], # data file of each paradigm (without .txt extension)
+        'nFrames': experiments[-1].win.nFlips,
+        'virtualTime': vt.now,
+        'wallTime': time.perf_counter() - wallStart}
+
+if __name__ == '__main__':
+    _thisDir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    for paradigm in ['ARI', 'SST']:
+        result = runHeadless(_thisDir, taskInfo={'Paradigm': paradigm, 'Experiment name': 'headless'})
+        print('%s: %s trials (%s min of task time) in %s s, %s ms per trial, final SSDs %s'%(paradigm, result['nTrials'],
+            round(result['virtualTime']/60,1), round(result['wallTime'],2), round(result['wallTimePerTrial']*1000,2), result['stopTimeArray']))
+    # Imported trials with practice blocks (the practice go/stop block uses rows of the trials file) and checkpoints
+    result = runHeadless(_thisDir, taskInfo={'Paradigm': 'SST', 'Experiment name': 'headless', 'Import trials?': True}, advSettings={'Save checkpoints?': True})
+    print('SST (imported trials): %s trials in %s s'%(result['nTrials'], round(result['wallTime'],2)))
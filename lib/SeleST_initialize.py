@@ -11,18 +11,66 @@ Selective Stopping Toolbox (SeleST)
 import os
 from psychopy import visual, core, gui, data
 from psychopy.hardware import keyboard
-import serial
 import numpy as np
 import array
 import json
+import platform
+from lib import SeleST_data, SeleST_timing, SeleST_input, SeleST_schedule, SeleST_stats, SeleST_ssd, SeleST_checkpoint, SeleST_profile
+
+# Define selectDefaults function
+#   Selects the default (first) option of any drop-down list in a settings dictionary, as is done by the GUI
+def selectDefaults(settings):
+    for key, value in settings.items():
+        if isinstance(value, list):
+            settings[key] = value[0]
+
+# Define loadMonitorProfile and saveMonitorProfile functions
+#   The measured frame rate of each display setup is saved so that it only needs to be measured once (measuring takes
+#   several seconds). Profiles are saved in a .json file with one entry per display setup (see Experiment.setupDisplay).
+#   A saved frame rate is checked with a short measurement every session and measured again if it differs by more than
+#   frameRateTolerance (e.g., if the refresh rate of the display was changed without changing its resolution).
+frameRateTolerance = 0.05 # proportion of the saved frame rate
+
+def loadMonitorProfile(profileFile, profileKey):
+    try:
+        with open(profileFile, 'r') as f:
+            return json.load(f).get(profileKey, {}).get('frameRate')
+    except (OSError, ValueError): # no profiles saved yet (or file could not be read)
+        return None
+
+def saveMonitorProfile(profileFile, profileKey, frameRate):
+    try:
+        with open(profileFile, 'r') as f:
+            profiles = json.load(f)
+    except (OSError, ValueError):
+        profiles = {}
+    profiles[profileKey] = {'frameRate': frameRate, 'date': data.getDateStr()}
+    os.makedirs(os.path.dirname(profileFile), exist_ok=True)
+    with open(profileFile + '.tmp', 'w') as f: # write to temporary file first so profiles are never left half-written
+        json.dump(profiles, f, indent=1)
+    os.replace(profileFile + '.tmp', profileFile)
+
+# Default general and advanced settings that depend on the paradigm (see Experiment). These settings are not carried
+#   over from one paradigm to the next when several paradigms are run in one session (see SeleST_session).
+paradigmGenDefaults = {
+    'ARI': {'Low feedback RT': 75, 'Mid feedback RT': 50, 'High feedback RT': 25},
+    'SST': {'Low feedback RT': 600, 'Mid feedback RT': 500, 'High feedback RT': 400}}
+paradigmAdvDefaults = {
+    'ARI': {'Target time (ms)': 800, 'Trial length (s)': 1.25, 'Variable delay lower limit (s)':0.5, 'Variable delay upper limit (s)': 1, 'Fixed delay length (s)': 0.5, 'Stop-both time (ms)': 600, 'Stop-left time (ms)': 550, 'Stop-right time (ms)': 550, 'Lower stop-limit (ms)': 150, 'Upper stop-limit (ms)': 50, 'Positional stop signal': False, 'Target position': 0.8, 'Stimulus size (cm)': 15},
+    'SST': {'Target time (ms)': 0, 'Trial length (s)': 1.25, 'Variable delay lower limit (s)':0.5, 'Variable delay upper limit (s)': 1, 'Fixed delay length (s)': 1, 'Stop-both time (ms)': 175, 'Stop-left time (ms)': 175, 'Stop-right time (ms)': 175, 'Lower stop-limit (ms)': 50, 'Upper stop-limit (ms)': -500, 'Positional stop signal': False, 'Target position': 0.8, 'Stimulus size (cm)': 5}}
 
 # Create Experiment class
 #   Contains both general and advanced settings in dictionaries that are presented in GUIs.
 #   A tool tip for each option is accessible by hovering the mouse over the input area.
 #   You can make changes to the default values by altering the code below, or by creating a specific Experiment class
 #   that is called in SeleST.py, e.g., Experiment_debug.
+#   Settings can also be passed in when creating the class (e.g., taskInfo={'Paradigm': 'SST'}) and the GUIs can be
+#   skipped with showGUI=False (see SeleST_headless for an example).
+#   The window, response device and clocks of an earlier Experiment can be reused by passing it as shared (e.g., to run
+#   several paradigms in one session, see SeleST_session).
 class Experiment():
-    def __init__(self,_thisDir):        
+    def __init__(self,_thisDir,taskInfo=None,genSettings=None,advSettings=None,showGUI=True,shared=None):
+        self.thisDir = _thisDir
         # Create dictionary with general task information (this dictionary will be exported to a .txt file if save data is selected)
         # NOTE: more info on participant demographics can be included by adding to this dictionary
         self.taskInfo = {
@@ -39,30 +87,38 @@ class Experiment():
             'Import trials?': False, # option to import file containing trial information as opposed to the options in general settings
             'File path': _thisDir + os.sep + 'conditions', # file path to folder containing trials file to import
             'File name': 'example_trials_1.csv', # name of the file to import
-            'Change general settings?': False} # option to change general settings via GUI
-        dlg=gui.DlgFromDict(dictionary=self.taskInfo, title='SeleST', # Create GUI for taskInfo dictionary w/ tool tips
-            order = ('Experiment name', 'Participant ID', 'Age (years)', 'Sex', 'Handedness', 'Paradigm', 'Response mode', 'RT type', 'Include practice?', 'Save data?', 'Import trials?', 'File path', 'File name', 'Change general settings?'),
-            tip={'Experiment name': 'Input name of experiment which will included in data file name',
-                 'Participant ID': 'Input ID of participant that will be included in data file name',
-                 'Paradigm': 'Select whether to use anticipatory response inhibition (ARI) or stop-signal task (SST) task',
-                 'RT type': 'Select whether to use choice or simple variant of the above paradigm',
-                 'Response mode': 'Select if trials should be initiated automatically (wait-and-press) or self-initiated by participant (hold-and-release)',
-                 'Include practice?': 'Select this to include instructions and practice blocks for the task',
-                 'Import trials?': 'Select this if you would like to import a trials file (NOTE: this will override randomisation)',
-                 'File path': 'File path to folder containing trials file to import',
-                 'File name': 'File name of trials file to be imported',
-                 'Change general settings?': 'Select this if you would like to change general settings of the task'})
-        if dlg.OK == False: core.quit()
+            'Change general settings?': False, # option to change general settings via GUI
+            'Resume session?': False} # option to continue the last unfinished session of this participant (see SeleST_checkpoint)
+        self.taskInfo.update(taskInfo or {}) # apply settings passed in when creating the class (e.g., when running without GUIs)
+        if showGUI == True:
+            dlg=gui.DlgFromDict(dictionary=self.taskInfo, title='SeleST', fixed=('Session order', 'Session part'), # Create GUI for taskInfo dictionary w/ tool tips
+                order = ('Experiment name', 'Participant ID', 'Age (years)', 'Sex', 'Handedness', 'Paradigm', 'Response mode', 'RT type', 'Include practice?', 'Save data?', 'Import trials?', 'File path', 'File name', 'Change general settings?', 'Resume session?'),
+                tip={'Experiment name': 'Input name of experiment which will included in data file name',
+                     'Participant ID': 'Input ID of participant that will be included in data file name',
+                     'Paradigm': 'Select whether to use anticipatory response inhibition (ARI) or stop-signal task (SST) task',
+                     'RT type': 'Select whether to use choice or simple variant of the above paradigm',
+                     'Response mode': 'Select if trials should be initiated automatically (wait-and-press) or self-initiated by participant (hold-and-release)',
+                     'Include practice?': 'Select this to include instructions and practice blocks for the task',
+                     'Import trials?': 'Select this if you would like to import a trials file (NOTE: this will override randomisation)',
+                     'File path': 'File path to folder containing trials file to import',
+                     'File name': 'File name of trials file to be imported',
+                     'Change general settings?': 'Select this if you would like to change general settings of the task',
+                     'Resume session?': 'Select this to continue the last unfinished session of this participant ID and experiment name from the next trial\n(NOTE: the settings of that session are used, so other options are ignored, and only sessions saved with checkpoints selected in the advanced settings can be resumed)'})
+            if dlg.OK == False: core.quit()
+        else: # use default option of each drop-down list if GUI is not shown
+            selectDefaults(self.taskInfo)
         self.taskInfo['date'] = data.getDateStr() # add timestamp (will be included in data filename)
+        self.resume = None
+        if self.taskInfo['Resume session?'] == True: # use the settings (and data files) of the unfinished session
+            self.resume = SeleST_checkpoint.Resume(SeleST_checkpoint.findCheckpoint(_thisDir, self.taskInfo['Participant ID'], self.taskInfo['Experiment name']))
+            self.taskInfo = self.resume.taskInfo
         # Create dictionary with general task settings      
-        if self.taskInfo['Paradigm'] == 'ARI': # default settings for ARI
-            genDefaults = {'Low feedback RT': 75, 'Mid feedback RT': 50, 'High feedback RT': 25}
-        elif self.taskInfo['Paradigm'] == 'SST': # default settings for SST
-            genDefaults = {'Low feedback RT': 600, 'Mid feedback RT': 500, 'High feedback RT': 400}
+        genDefaults = paradigmGenDefaults[self.taskInfo['Paradigm']]
         self.genSettings = {
             'Monitor name': 'testMonitor', # name of monitor (see https://www.psychopy.org/builder/builderMonitors.html for more info)
             'Full-screen?': True, # option to run task in full-screen or borderless window
             'Screen': 0, # screen to use (0 = primary display)
+            'Re-measure frame rate?': False, # option to measure the frame rate again rather than using the value saved for this display
             'Use response box?': False, # option to enable external response box
             'Trial-by-trial feedback?': True, # option to present trial-by-trial feedback
             'Low feedback RT': genDefaults['Low feedback RT'], # option to set RT bands for feedback
@@ -75,31 +131,42 @@ class Experiment():
             'n stop-right trials per block': 4,
             'n blocks': 12, # number of blocks to repeat the above trial arrangement over
             'n forced go trials': 3, # number of go trials to force at the start of each block
+            'Max stop trials in a row': 0, # maximum number of consecutive stop trials (0 = no limit)
+            'Min trials between same stop type': 0, # minimum number of trials between two stop trials of the same type (0 = no limit)
+            'Balance choices across trial types?': False, # option to give each trial type an equal number of each choice (choice RT only)
             'Staircase stop-signal delays?': True, # option to use staircased SSDs, SSDs will be fixed if not selected
+            'SSD policy': ['Staircase', 'Bayesian (QUEST)'], # how stop-signal delays are adjusted if staircasing is enabled (see SeleST_ssd)
             'Stop-signal delay step-size (ms)': 50, # step size to change stop-signal delay by if staircasing is enabled
             'Change advanced settings?':False} # option to change advanced settings via GUI              
-        if self.taskInfo['Change general settings?']:
+        self.genSettings.update(genSettings or {})
+        if self.resume is not None:
+            self.genSettings = self.resume.genSettings
+        elif self.taskInfo['Change general settings?'] and showGUI == True:
             dlg=gui.DlgFromDict(dictionary=self.genSettings, title='SeleST (general settings)', # Create GUI for expInfo dictionary w/ tool tips
-                order = ('Monitor name', 'Full-screen?', 'Screen', 'Use response box?', 'Trial-by-trial feedback?', 'Low feedback RT', 'Mid feedback RT', 'High feedback RT', 'n practice go trials', 'n go trials per block', 'n stop-both trials per block', 'n stop-left trials per block', 'n stop-right trials per block', 'n blocks', 'n forced go trials', 'Staircase stop-signal delays?', 'Stop-signal delay step-size (ms)', 'Change advanced settings?'),
+                order = ('Monitor name', 'Full-screen?', 'Screen', 'Re-measure frame rate?', 'Use response box?', 'Trial-by-trial feedback?', 'Low feedback RT', 'Mid feedback RT', 'High feedback RT', 'n practice go trials', 'n go trials per block', 'n stop-both trials per block', 'n stop-left trials per block', 'n stop-right trials per block', 'n blocks', 'n forced go trials', 'Max stop trials in a row', 'Min trials between same stop type', 'Balance choices across trial types?', 'Staircase stop-signal delays?', 'SSD policy', 'Stop-signal delay step-size (ms)', 'Change advanced settings?'),
                 tip = {
                      'Monitor name': 'Input name of the monitor being used to present the task (see Monitor Centre for more info)',
                      'Full-screen?': 'Select this if you would like to run the task in full-screen mode (recommended for data collection)',
                      'Screen': 'Screen to use (0 is primary display, 1 is second display etc)',
+                     'Re-measure frame rate?': 'The frame rate is measured the first time a display is used and then saved (see data/SeleST_monitorProfiles.json).\nSelect this to measure it again (e.g., after changing the refresh rate of the display without changing its resolution)',
                      'Use response box?': 'Select this if you would like to use an external response box',
                      'Trial-by-trial feedback?': 'Select this if you would like to present trial-by-trial feedback.\nYou can modify low, mid and high feedback ranges below.\nFeedback RT ranges are based on RT relative to target for ARI (the closer the better) and speed of RT for SST (the faster the better)',
                      'n practice go trials': 'Number of go trials to include in practice go-only block',
                      'n blocks': 'Set the number of blocks to repeat the trials across\n(NOTE: if importing trials the number of trials will be divided by n blocks; e.g., 100 trials, 10 blocks = 10 blocks x 10 trials)',
                      'n forced go trials': 'Input the number of go trials you would like to force at the start of each block',
+                     'Max stop trials in a row': 'Input the maximum number of stop trials that can be presented in a row (0 = no limit)',
+                     'Min trials between same stop type': 'Input the minimum number of trials between two stop trials of the same type (e.g., two stop-left trials) (0 = no limit)',
+                     'Balance choices across trial types?': 'Select this to present each choice equally often for each trial type (e.g., half of the stop-left trials with choice 1), otherwise choices are randomised across all trials of a block',
                      'Staircase stop-signal delays?': 'Select this to staircase stop-signal delays to achieve a 50% stopping success for each stop trial type',
-                     'Stop-signal delay step-size (ms)': 'Enter size to increase/decrease stop-signal delay during staircasing',
+                     'SSD policy': 'Select how stop-signal delays are adjusted after each stop trial:\nStaircase = fixed step up after a successful stop and down after a failed stop\nBayesian (QUEST) = set to the current estimate of the delay giving 50% stopping success (converges in fewer stop trials)',
+                     'Stop-signal delay step-size (ms)': 'Enter size to increase/decrease stop-signal delay during staircasing (Staircase policy only)',
                      'Change advanced settings?': 'Select this if you would like to change any of the advanced settings'})
             if dlg.OK ==False: core.quit() # user pressed cancel
+        else: # use default option of each drop-down list if GUI is not shown
+            selectDefaults(self.genSettings)
 
         # Create dictionary with advanced task settings (default settings dependent on paradigm)
-        if self.taskInfo['Paradigm'] == 'ARI': # default settings for ARI
-            Defaults = {'Target time (ms)': 800, 'Trial length (s)': 1.25, 'Variable delay lower limit (s)':0.5, 'Variable delay upper limit (s)': 1, 'Fixed delay length (s)': 0.5, 'Stop-both time (ms)': 600, 'Stop-left time (ms)': 550, 'Stop-right time (ms)': 550, 'Lower stop-limit (ms)': 150, 'Upper stop-limit (ms)': 50, 'Positional stop signal': False, 'Target position': 0.8, 'Stimulus size (cm)': 15}
-        elif self.taskInfo['Paradigm'] == 'SST': # default settings for SST
-            Defaults = {'Target time (ms)': 0, 'Trial length (s)': 1.25, 'Variable delay lower limit (s)':0.5, 'Variable delay upper limit (s)': 1, 'Fixed delay length (s)': 1, 'Stop-both time (ms)': 175, 'Stop-left time (ms)': 175, 'Stop-right time (ms)': 175, 'Lower stop-limit (ms)': 50, 'Upper stop-limit (ms)': -500, 'Positional stop signal': False, 'Target position': 0.8, 'Stimulus size (cm)': 5}        
+        Defaults = paradigmAdvDefaults[self.taskInfo['Paradigm']]
         self.advSettings = {
             'Send serial trigger at trial onset?': False, # option to send serial trigger at trial onset (NOTE: a compatible serial device will need to be set up before this works)
             'Left response key': 'x', # response key for left stimulus
@@ -127,11 +194,22 @@ class Experiment():
             'Cue color': 'black', # colour of cues (ARI = target lines, SST = outline of rectangle)
             'Go color': 'black', # colour of go signal (ARI = filling bar, SST = filling of rectangle)
             'Stop color': 'cyan', # colour of stop signal (same as above)
-            'Background color': 'grey' # colour of background
+            'Background color': 'grey', # colour of background
+            'Log frame timing?': False, # option to save the timing of every frame (saved next to the data file if save data is selected)
+            'Collect responses in background?': False, # option to collect responses in a background thread rather than once per frame (psychtoolbox keyboard only)
+            'Save binary (.npy) data?': False, # option to also save trial data as a typed NumPy .npy file (faster to load for analyses)
+            'Save response events?': False, # option to save the key-down and key-up times of every key press (saved next to the data file if save data is selected)
+            'Save block statistics?': False, # option to save a summary of performance (go RT, stop success, SSD and SSRT) after every block
+            'Save checkpoints?': False, # option to save the state of the session after every trial so it can be resumed after a crash (see SeleST_checkpoint)
+            'Profile task stages?': False, # option to time every stage of the trial pipeline and print/save a report at the end (see SeleST_profile)
+            'Profile blocks with cProfile?': False # option to also profile every block with cProfile (only used if stages are profiled)
             }        
-        if self.genSettings['Change advanced settings?']:
+        self.advSettings.update(advSettings or {})
+        if self.resume is not None:
+            self.advSettings = self.resume.advSettings
+        elif self.genSettings['Change advanced settings?'] and showGUI == True:
             dlg=gui.DlgFromDict(dictionary=self.advSettings, title='SeleST (Advanced settings)', # Create GUI for advExpInfo dictionary if advanced option was selected
-                order = ('Send serial trigger at trial onset?', 'Left response key', 'Right response key', 'Left 2 response key', 'Right 2 response key', 'Target time (ms)', 'Trial length (s)', 'Feedback duration (s)', 'Intertrial interval (s)', 'Blank intertrial interval?', 'Fixed delay?', 'Variable delay lower limit (s)', 'Variable delay upper limit (s)', 'Fixed delay length (s)', 'Stop-both time (ms)', 'Stop-left time (ms)', 'Stop-right time (ms)', 'Lower stop-limit (ms)', 'Upper stop-limit (ms)', 'Positional stop signal', 'Target position', 'Stimulus size (cm)', 'Stimulus width (cm)', 'Background color', 'Cue color', 'Go color', 'Stop color'),
+                order = ('Send serial trigger at trial onset?', 'Left response key', 'Right response key', 'Left 2 response key', 'Right 2 response key', 'Target time (ms)', 'Trial length (s)', 'Feedback duration (s)', 'Intertrial interval (s)', 'Blank intertrial interval?', 'Fixed delay?', 'Variable delay lower limit (s)', 'Variable delay upper limit (s)', 'Fixed delay length (s)', 'Stop-both time (ms)', 'Stop-left time (ms)', 'Stop-right time (ms)', 'Lower stop-limit (ms)', 'Upper stop-limit (ms)', 'Positional stop signal', 'Target position', 'Stimulus size (cm)', 'Stimulus width (cm)', 'Background color', 'Cue color', 'Go color', 'Stop color', 'Log frame timing?', 'Collect responses in background?', 'Save binary (.npy) data?', 'Save response events?', 'Save block statistics?', 'Save checkpoints?', 'Profile task stages?', 'Profile blocks with cProfile?'),
                 tip = {
                      'Send serial trigger at trial onset?': 'Select this if you would like to send a trigger at trial onset\n(NOTE: a serial device must be set up for this to work)',
                      'Target time (ms)': 'Input the desired target response time\n(NOTE: keep in mind that trial length needs to be adjusted to allow for complete filling if target time is extended too far)',
@@ -149,10 +227,53 @@ class Experiment():
                      'Cue color': 'Input name of desired color of the cue (ARI = target lines, SST = triangle outline)',
                      'Go color': 'Input name of desired color of the go signal (ARI = filling bar, SST = triangle filling)',
                      'Stop color': 'Input name of desired color of the stop signal (ARI = filling bar, SST = triangle filling)',
-                     'Background color': 'Input name of desired color of the background\n(for list of possible colors see https://www.w3schools.com/Colors/colors_names.asp )'})
-        if dlg.OK==False: core.quit()
-        
-        # Set up the window in which we will present stimuli
+                     'Background color': 'Input name of desired color of the background\n(for list of possible colors see https://www.w3schools.com/Colors/colors_names.asp )',
+                     'Log frame timing?': 'Select this to save flip times, stimulus update times and dropped frames for every frame of every trial\n(NOTE: only saved if save data is selected)',
+                     'Collect responses in background?': 'Select this to collect responses continuously in a background thread, otherwise responses are collected once per frame\n(NOTE: only used with the psychtoolbox keyboard backend, responses are collected once per frame with other devices)',
+                     'Save binary (.npy) data?': 'Select this to also save trial data as a .npy file next to the .txt file (see SeleST_data.loadSession)\n(NOTE: only saved if save data is selected)',
+                     'Save response events?': 'Select this to save every key press and release (including repeated presses) with its time relative to trial onset\n(NOTE: only saved if save data is selected)',
+                     'Save block statistics?': 'Select this to save go RT, go omissions, stop success, current stop-signal delays and running SSRT estimates after every block\n(NOTE: a summary is always printed to the console, but only saved if save data is selected)',
+                     'Save checkpoints?': 'Select this to save the state of the session after every trial, so that an interrupted session can be continued by selecting resume session in the first GUI\n(NOTE: only saved if save data is selected)',
+                     'Profile task stages?': 'Select this to record the wall and CPU time of every stage of every trial (e.g., runTrial, saveData, ITI) and print a report with percentiles at the end\n(NOTE: the report is only saved if save data is selected)',
+                     'Profile blocks with cProfile?': 'Select this to also save a cProfile profile of every block (*_block<n>.prof)\n(NOTE: only used if task stages are profiled, and slows the task down, so do not use when collecting data)'})
+            if dlg.OK==False: core.quit()
+
+        # Set up the window and response device (see functions below)
+        if shared is None:
+            self.setupDisplay()
+            self.setupInput()
+        else:
+            self.shareDevices(shared)
+
+        # Map response keys to responses (0 = L, 1 = R, 2 = L2, 3 = R2, -1 = quit) and set up response collection during trials (see SeleST_input)
+        self.respKeyMap = {self.L_resp_key: 0, self.R_resp_key: 1, self.L2_resp_key: 2, self.R2_resp_key: 3, 'q': -1, 'escape': -1}
+        threaded = self.advSettings['Collect responses in background?'] == True and SeleST_input.threadSafe(self.rb)
+        if self.advSettings['Collect responses in background?'] == True and not threaded:
+            print('Responses are collected once per frame (background collection needs the psychtoolbox keyboard backend)')
+        self.input = SeleST_input.InputCollector(self.rb, self.respKeyMap, waitRelease=self.taskInfo['Response mode'] == 'Hold-and-release',
+            threaded=threaded)
+
+        # Create clocks to monitor trial duration and trial times
+        if shared is None:
+            self.globalClock = core.Clock() # to track total time of experiment
+            self.trialClock = core.Clock() # to track time on a trial-by-trial basis
+            self.holdClock = core.Clock() # to track press time when waiting for key press in hold and release
+        else: # keep timing from the start of the session
+            self.globalClock, self.trialClock, self.holdClock = shared.globalClock, shared.trialClock, shared.holdClock
+
+        # Set up data files and load instructions (see functions below)
+        self.setupOutput(_thisDir)
+        self.loadInstructions(_thisDir)
+
+        if self.taskInfo['Include practice?'] == True: # markers to keep track of practice if option is selected
+            self.practiceGo = True
+            self.practiceStop = True
+        else: # don't practice if option is disabled
+            self.practiceGo = False
+            self.practiceStop = False
+
+    # Set up the window in which we will present stimuli and measure the monitors refresh rate
+    def setupDisplay(self):
         self.win = visual.Window(
             fullscr=self.genSettings['Full-screen?'],
             winType='pyglet',
@@ -164,16 +285,47 @@ class Experiment():
             size = [1200, 1200],
             screen = self.genSettings['Screen'])
         
-        # Measure the monitors refresh rate
-        self.taskInfo['frameRate'] = self.win.getActualFrameRate()
-        self.frameRate = self.taskInfo['frameRate']
+        # Measure the monitors refresh rate (only the first time a display is used, after that the saved value is used if a short check agrees)
+        profileFile = self.thisDir + os.sep + 'data' + os.sep + 'SeleST_monitorProfiles.json'
+        profileKey = '%s|%s|screen %s|%s|%sx%s'%(platform.node(), self.genSettings['Monitor name'], self.genSettings['Screen'],
+            'full-screen' if self.genSettings['Full-screen?'] else 'window', self.win.size[0], self.win.size[1]) # changes if the display setup changes
+        self.frameRate = None
+        if self.genSettings['Re-measure frame rate?'] == False:
+            self.frameRate = loadMonitorProfile(profileFile, profileKey)
+        if self.frameRate != None: # check the saved frame rate with a short measurement
+            checkRate = self.win.getActualFrameRate(nIdentical=5, nMaxFrames=30, nWarmUpFrames=5)
+            if checkRate != None and abs(checkRate - self.frameRate) > self.frameRate*frameRateTolerance:
+                print('Frame rate (%s Hz) differs from the saved frame rate for this display (%s Hz), measuring it again'%(round(checkRate,1), round(self.frameRate,1)))
+                self.frameRate = None
+            else:
+                print('Using saved frame rate for this display (select re-measure frame rate in general settings to measure it again)')
+        if self.frameRate == None:
+            self.frameRate = self.win.getActualFrameRate()
+            if self.frameRate != None:
+                saveMonitorProfile(profileFile, profileKey, self.frameRate)
+        self.taskInfo['frameRate'] = self.frameRate
         if self.frameRate != None:
             self.frameDur = 1.0 / round(self.frameRate) * 1000
         else:
             self.frameDur = 1.0 / 60.0 * 1000 # could not measure, so guess
-        print('Monitor frame rate is %s Hz' %(round(self.taskInfo['frameRate'],0))) # print out useful info on frame rate & duration for the interested user
+        print('Monitor frame rate is %s Hz' %(round(1000/self.frameDur,0))) # print out useful info on frame rate & duration for the interested user
         print('Frame duration is %s ms' %round(self.frameDur,1))        
 
+    # Use the window, frame rate, response device (and serial device) of an earlier Experiment, so the window does not
+    # need to be created and the frame rate measured again
+    def shareDevices(self, shared):
+        self.win = shared.win
+        self.win.color = self.advSettings['Background color']
+        self.frameRate = shared.frameRate
+        self.frameDur = shared.frameDur
+        self.taskInfo['frameRate'] = self.frameRate
+        self.rb = shared.rb
+        for name in ['L_resp_key', 'R_resp_key', 'L2_resp_key', 'R2_resp_key', 'ser', 'partEndText']: # partEndText: break screen between paradigms (see SeleST_session.partEnd)
+            if hasattr(shared, name):
+                setattr(self, name, getattr(shared, name))
+
+    # Set up the response device (keyboard or response box) and serial device
+    def setupInput(self):
         # Here you can implement code to operate an external response box. 
         # NOTE: the keyboard will be used if no response box is selected.
         if self.genSettings['Use response box?'] == True:
@@ -194,32 +346,42 @@ class Experiment():
         # Here you can set up a serial device (e.g. to send trigger at trial onset)
         if self.advSettings['Send serial trigger at trial onset?'] == True:    
             # e.g.
+            #import serial # imported here so that pyserial is only needed when triggers are used
             #self.ser = serial.Serial('COM8', 9600, timeout=0)
             #line = self.ser.readline()
             pass
 
-        # Create clocks to monitor trial duration and trial times
-        self.globalClock = core.Clock() # to track total time of experiment
-        self.trialClock = core.Clock() # to track time on a trial-by-trial basis
-        self.holdClock = core.Clock() # to track press time when waiting for key press in hold and release
-
+    # Set up files to save data to
+    def setupOutput(self,_thisDir):
         # SAVE DATA
         # Check if a "data" folder exists in this directory, and make one if not.
         if not os.path.exists(_thisDir + os.sep +'data/'):
             print('Data folder did not exist, making one in current directory')
             os.makedirs(_thisDir + os.sep +'data/')
+        self.arrayWriter = None
+        self.eventWriter = None
         if self.taskInfo['Save data?'] == True: # only save if option is selected
             self.Output = _thisDir + os.sep + u'data/SeleST_%s_%s_%s' % (self.taskInfo['Participant ID'],
                 self.taskInfo['Experiment name'], self.taskInfo['date']) # create output file to store behavioural data
-            with open(self.Output+'.txt', 'a') as b: # create file w/ headers
-                b.write('block trial startTime trialName trialType stopTime L_targetTime R_targetTime Choice L_press R_press L2_press R2_press L_RT R_RT L2_RT R2_RT\n')
+            if self.resume is not None: # data are added to the files of the resumed session (headers are only written to new files)
+                self.resume.trimDataFiles(self.Output)
+            self.dataWriter = SeleST_data.DataWriter(self.Output+'.txt', # create file w/ headers (trial data are written in the background, see SeleST_data)
+                header='block trial startTime trialName trialType stopTime L_targetTime R_targetTime Choice L_press R_press L2_press R2_press L_RT R_RT L2_RT R2_RT\n')
+            if self.advSettings['Save binary (.npy) data?'] == True: # create .npy file for typed trial data
+                self.arrayWriter = SeleST_data.ArrayWriter(self.Output+'.npy', append=self.resume is not None)
+            if self.advSettings['Save response events?'] == True: # create file for key-down/key-up events (one row per event)
+                self.eventWriter = SeleST_data.DataWriter(self.Output+'_events.txt', header='block trial respIndex key event time\n')
             taskInfo_output = _thisDir + os.sep + u'data/SeleST_%s_%s_%s_taskInfo.txt' % (self.taskInfo['Participant ID'],
                 self.taskInfo['Experiment name'], self.taskInfo['date']) # create output file to store taskInfo dictionary                       
             with open(taskInfo_output, 'w') as convert_file:
                  convert_file.write(json.dumps(self.taskInfo)) # save taskInfo dictionary            
+        self.frameLog = SeleST_timing.FrameLog(self) # monitor frame timing during trials (see SeleST_timing)
+        self.sessionStats = SeleST_stats.SessionStats(self) # running performance statistics (see SeleST_stats)
+        self.checkpoint = SeleST_checkpoint.Checkpoint(self) # state of the session after every trial, to resume after a crash (see SeleST_checkpoint)
+        self.profiler = SeleST_profile.Profiler(self) # time each stage of the trial pipeline if selected (see SeleST_profile)
 
-        # INSTRUCTIONS        
-        # Load instructions depending on selected paradigm
+    # Load instructions depending on selected paradigm
+    def loadInstructions(self,_thisDir):
         # NOTE: instructions can be modified by replacing the associated .png for each instruction (see SeleST_instructions.ppt for instruction slides)
         if self.taskInfo['Paradigm'] == 'ARI' and self.taskInfo['RT type'] == 'Simple':
             instrDir = _thisDir+'/instructions/ARI_simple/'
@@ -230,18 +392,119 @@ class Experiment():
         if self.taskInfo['Paradigm'] == 'SST' and self.taskInfo['RT type'] == 'Choice':
             instrDir = _thisDir+'/instructions/SST_choice/'
         
-        self.instr_1_go = visual.ImageStim(self.win, image=instrDir+'go_practice_1.png')
-        self.instr_2_points = visual.ImageStim(self.win, image=instrDir+'go_practice_2.png')
-        self.instr_3_stop = visual.ImageStim(self.win, image=instrDir+'stop_practice.png')
-        self.instr_4_task = visual.ImageStim(self.win, image=_thisDir+'/instructions/preTask.png')
+        # Practice instructions are only loaded if they will be used
+        if self.taskInfo['Include practice?'] == True:
+            self.instr_1_go = visual.ImageStim(self.win, image=instrDir+'go_practice_1.png')
+            self.instr_2_points = visual.ImageStim(self.win, image=instrDir+'go_practice_2.png')
+            self.instr_3_stop = visual.ImageStim(self.win, image=instrDir+'stop_practice.png')
+            self.instr_4_task = visual.ImageStim(self.win, image=_thisDir+'/instructions/preTask.png')
+            instructions = [self.instr_1_go, self.instr_2_points, self.instr_3_stop, self.instr_4_task]
+        else:
+            instructions = []
         self.instr_5_taskEnd = visual.ImageStim(self.win, image=_thisDir+'/instructions/endTask.png')
-                
-        if self.taskInfo['Include practice?'] == True: # markers to keep track of practice if option is selected
-            self.practiceGo = True
-            self.practiceStop = True
-        else: # don't practice if option is disabled
-            self.practiceGo = False
-            self.practiceStop = False
+        self.blockEndScreen = BlockEndScreen(self.win) # end-of-block feedback (created once and updated every block)
+
+        # Draw the instruction images and the end-of-block text (with every character the scores can use) to the back buffer
+        # (without showing them), so that their textures and font glyphs are ready before they are first shown
+        self.blockEndScreen.prewarm()
+        self.prewarm(instructions + [self.instr_5_taskEnd])
+
+    # Draw stimuli once and then clear the window, so that textures are uploaded to the graphics card in advance
+    def prewarm(self,stims):
+        for s in stims:
+            s.draw()
+        self.win.clearBuffer()
+
+# Create BlockEndScreen class
+#   Text stimuli for end-of-block feedback are created once and only the text that changes is updated each block.
+#   The screen is drawn once and then left on screen while waiting for the participant to continue.
+class BlockEndScreen:
+    def __init__(self, win):
+        self.win = win
+        self.blockEnd = visual.TextStim(win, pos=[0,3], height=1, color= [1,1,1],
+            text='End of block -!', units='cm' )
+        self.scoreBreakdown = visual.TextStim(win, pos=[0,1.5], height=1, color= [1,1,1],
+            text='Score breakdown:', units='cm' )
+        self.prevBlockFeedback = visual.TextStim(win, pos=[0,0], height=1, color= [1,1,1],
+            text='Previous block: -', units='cm' )
+        self.thisBlockFeedback = visual.TextStim(win, pos=[0, -1.5], height=1, color= [1,1,1],
+            text='This block: 0 points', units='cm' )
+        self.totalScoreFeedback = visual.TextStim(win, pos=[0, -3], height=1, color= [1,1,1],
+            text='Total: 0 points', units='cm' )
+        self.instrFeedback = visual.TextStim(win, pos=[0, -5], height=1, color= [1,1,1],
+            text='Press the space key to continue', units='cm' )
+        self.stimList = [self.blockEnd, self.instrFeedback, self.scoreBreakdown, self.thisBlockFeedback, self.totalScoreFeedback, self.prevBlockFeedback]
+
+    # Update text (only if it has changed, as text layout is expensive)
+    def setText(self, stim, text):
+        if stim.text != text:
+            stim.text = text
+
+    # Draw the feedback text with the characters of any block number and score (so their glyphs are rendered before the
+    # first block ends), then set the starting text again. Called by Experiment.loadInstructions, which clears the window.
+    def prewarm(self):
+        texts = [s.text for s in self.stimList]
+        self.setText(self.blockEnd, 'End of block -0123456789!')
+        self.setText(self.prevBlockFeedback, 'Previous block: -0123456789 points')
+        self.setText(self.thisBlockFeedback, 'This block: -0123456789 points')
+        self.setText(self.totalScoreFeedback, 'Total: -0123456789 points')
+        for s in self.stimList:
+            s.draw()
+        for s, text in zip(self.stimList, texts):
+            self.setText(s, text)
+
+    # Update feedback for the current block and present it
+    def show(self, trialInfo):
+        self.setText(self.blockEnd, 'End of block %s!'%(trialInfo.blockCount))
+        if trialInfo.blockCount > 1:
+            self.setText(self.prevBlockFeedback, 'Previous block: %s points'%(trialInfo.prevBlockScore))
+        else:
+            self.setText(self.prevBlockFeedback, 'Previous block: -')
+        self.setText(self.thisBlockFeedback, 'This block: %s points'%(trialInfo.blockScore))
+        self.setText(self.totalScoreFeedback, 'Total: %s points'%(trialInfo.totalScore))
+        for s in self.stimList:
+            s.draw()
+        self.win.flip()
+
+# Create TrackedStim class
+#   Wraps a PsychoPy stimulus and keeps track of its visibility (autoDraw), colours, size and position, so that
+#   only actual changes are passed on to PsychoPy (setting these attributes is expensive as the vertices and
+#   colours of the stimulus need to be updated). All other attributes are passed straight to the stimulus.
+class TrackedStim:
+    trackedAttributes = ('fillColor', 'lineColor', 'size', 'pos')
+
+    def __init__(self, stim):
+        object.__setattr__(self, 'stim', stim)
+        object.__setattr__(self, 'autoDraw', stim.autoDraw)
+        object.__setattr__(self, 'values', {}) # last values set for tracked attributes
+
+    def setAutoDraw(self, value):
+        if value != self.autoDraw: # only change visibility if needed
+            object.__setattr__(self, 'autoDraw', value)
+            self.stim.setAutoDraw(value)
+
+    def __setattr__(self, name, value):
+        if name in self.trackedAttributes:
+            if name in self.values and not hasChanged(self.values[name], value): # skip if value is unchanged
+                return
+            self.values[name] = value
+        setattr(self.stim, name, value)
+
+    def __getattr__(self, name): # called for any attribute not stored on TrackedStim
+        return getattr(self.stim, name)
+
+# Define hasChanged function
+#   Compares old and new values of a stimulus attribute. Scalars and strings (e.g., opacity, text or colour names) are
+#   compared directly, only lists, tuples and arrays (e.g., size, position or RGB colours) are compared as arrays.
+def hasChanged(old, new):
+    if old is new:
+        return False
+    if not isinstance(old, (list, tuple, np.ndarray)) or not isinstance(new, (list, tuple, np.ndarray)):
+        return type(old) != type(new) or bool(old != new)
+    try:
+        return not np.array_equal(old, new)
+    except (ValueError, TypeError): # e.g., values that cannot be converted to arrays
+        return True
 
 # Create Stimuli class
 #   Generates stimuli that will be presented during the task
@@ -269,6 +532,10 @@ class Stimuli:
             self.L_cue2 = visual.Rect(exp.win, fillColor=None, lineWidth = 10, lineColor=exp.advSettings['Cue color'], opacity=1, units='cm', size=[exp.advSettings['Stimulus width (cm)'],exp.advSettings['Stimulus size (cm)']],pos=[-(exp.advSettings['Stimulus width (cm)'])*3,0])
             self.R_cue2 = visual.Rect(exp.win, fillColor=None, lineWidth = 10, lineColor=exp.advSettings['Cue color'], opacity=1, units='cm', size=[exp.advSettings['Stimulus width (cm)'],exp.advSettings['Stimulus size (cm)']],pos=[(exp.advSettings['Stimulus width (cm)'])*3,0])
 
+        # Track the state of each stimulus so only actual changes to visibility, colour, size and position are made (see TrackedStim)
+        for name in ['L_emptyStim', 'L_stim', 'R_emptyStim', 'R_stim', 'L_emptyStim2', 'L_stim2', 'R_emptyStim2', 'R_stim2', 'L_cue', 'R_cue', 'L_cue2', 'R_cue2']:
+            setattr(self, name, TrackedStim(getattr(self, name)))
+
         self.xStimPos = [-exp.advSettings['Stimulus width (cm)'], exp.advSettings['Stimulus width (cm)'], -exp.advSettings['Stimulus width (cm)']*3, exp.advSettings['Stimulus width (cm)']*3] # set horizontal position of stimuli (this is important for ARI when updating size)
         if exp.taskInfo['RT type'] == 'Choice': # set stimuli to draw at start of each trial
             self.eStimList = [self.L_cue, self.L_cue2, self.R_cue, self.R_cue2, self.L_emptyStim, self.L_emptyStim2, self.R_emptyStim, self.R_emptyStim2]
@@ -281,7 +548,7 @@ class Stimuli:
 class Trials:
     def __init__(self,exp):
         if exp.taskInfo['Import trials?'] == True: # import trials from conditions file
-            self.trialList = data.importConditions(exp.taskInfo['File path'] + os.sep + exp.taskInfo['File name'])
+            self.trialList = SeleST_schedule.loadSchedule(exp.taskInfo['File path'] + os.sep + exp.taskInfo['File name'], exp.genSettings['n blocks']) # checked and compiled trials (see SeleST_schedule), read by index during the task
             self.blockTrials = np.array_split(self.trialList,exp.genSettings['n blocks'])
         else:
             nGoTrials = [1] * exp.genSettings['n go trials per block'] # set number of go and stop trials
@@ -295,9 +562,12 @@ class Trials:
             self.choiceList = int(len(self.trialList)/2)*[1] + int(len(self.trialList)/2)*[2]
             
         # Insert practice routine if option is selected
+        self.nBlocks = exp.genSettings['n blocks'] # number of blocks to run (the 'n blocks' setting itself is not changed)
         if exp.taskInfo['Include practice?'] == True:
-            exp.genSettings['n blocks'] = exp.genSettings['n blocks'] + 2 # add an additional block if practice trials have been selected
-        self.blockList = [1] * exp.genSettings['n blocks'] # create list of blocks (NOTE: this can be used in the future to set block types)
+            self.nBlocks = self.nBlocks + 2 # add the practice go-only and go/stop blocks if practice trials have been selected
+        self.blockList = [1] * self.nBlocks # create list of blocks (NOTE: this can be used in the future to set block types)
+        
+        self.rng = np.random.default_rng() # random number generator used to order trials and choices
         
         # Set up counters for block/trial number & scores
         self.blockCount = 0
@@ -322,6 +592,16 @@ class SSD:
             # Additional stop-times for different conditions (e.g. reac vs proac) can be included by adding additional variables to the array.
         self.stopTimeArray = array.array('i', [0, exp.advSettings['Stop-both time (ms)'],exp.advSettings['Stop-left time (ms)'],exp.advSettings['Stop-right time (ms)']]) # array to store stopTimes (NOTE: can append stop time for additional staircases)
         self.strcaseTime = exp.genSettings['Stop-signal delay step-size (ms)'] # set desired increment for staircase
+        # Set up the policy used to adjust stop-signal delays after each stop trial (see SeleST_ssd)
+        lowerLimit = exp.advSettings['Lower stop-limit (ms)'] # stop-signal delays are kept within these limits
+        upperLimit = exp.advSettings['Target time (ms)'] - exp.advSettings['Upper stop-limit (ms)']
+        self.policy = None
+        if exp.genSettings['Staircase stop-signal delays?'] == True: # only used if staircasing is enabled
+            if upperLimit < lowerLimit:
+                raise ValueError('Stop-signal delays cannot be staircased: the upper limit (target time %s ms - upper stop-limit %s ms = %s ms) '
+                    'is below the lower stop-limit (%s ms), check the stop-limits in the advanced settings' % (exp.advSettings['Target time (ms)'],
+                    exp.advSettings['Upper stop-limit (ms)'], upperLimit, lowerLimit))
+            self.policy = SeleST_ssd.policies[exp.genSettings['SSD policy']](self.stopTimeArray, self.strcaseTime, lowerLimit, upperLimit)
     
 """
 MODIFIED CLASSES CAN BE INSERTED BELOW
@@ -0,0 +1,79 @@
+"""
+Selective Stopping Toolbox (SeleST)
+
+    SeleST_input
+        Classes for collecting responses during trials can be found in this script
+
+    See the SeleST.py script for general information on the task
+"""
+
+# Import required modules
+import time
+import threading
+import collections
+
+# Define threadSafe function
+#   Returns True if the response device can be polled by a background thread. This is only the case for the
+#   psychtoolbox (ptb) backend of psychopy.hardware.keyboard, which collects keys in its own process. With other
+#   backends, getKeys handles window events, which must only be done by the thread that flips the window.
+def threadSafe(rb):
+    getBackend = getattr(rb, 'getBackend', None)
+    return getBackend is not None and getBackend() == 'ptb'
+
+# Create InputCollector class
+#   Collects key presses from the response device (exp.rb) during a trial. When threaded, the device is polled
+#   continuously by a background thread so that response collection does not depend on the frame rate or on how
+#   long stimuli take to update. Keys are mapped to responses once using keyMap (key name -> response index,
+#   with negative indices for quit keys), so the trial loop receives ready-made (response index, key) events.
+#   Collection runs between start() (called on the flip at trial onset) and stop() (called at the end of the trial).
+#   Only use threaded collection with a device that can be polled from another thread (see threadSafe), otherwise the
+#   device is polled once per frame on the main thread.
+class InputCollector:
+    def __init__(self, rb, keyMap, waitRelease=False, threaded=False, pollInterval=0.001):
+        self.rb = rb
+        self.keyMap = keyMap
+        self.keyList = list(keyMap) # keys to monitor
+        self.waitRelease = waitRelease # report keys when released (hold-and-release) rather than when pressed
+        self.threaded = threaded
+        self.pollInterval = pollInterval # time between polls of the response device (s)
+        self.events = collections.deque() # collected (response index, key) events
+        self.collecting = threading.Event()
+        self.pollLock = threading.Lock()
+        if self.threaded:
+            self.thread = threading.Thread(target=self._run, name='SeleST_InputCollector', daemon=True)
+            self.thread.start()
+
+    # Start collecting responses (any events from before are discarded)
+    def start(self):
+        self.events.clear()
+        self.collecting.set()
+
+    # Stop collecting responses
+    def stop(self):
+        self.collecting.clear()
+        with self.pollLock: # wait for any poll in progress to finish
+            pass
+
+    # Return events collected since the last call
+    def getEvents(self):
+        if not self.threaded:
+            self._poll()
+        events = []
+        while self.events:
+            events.append(self.events.popleft())
+        return events
+
+    # Check response device for keys and map them to responses
+    def _poll(self):
+        with self.pollLock:
+            if not self.collecting.is_set():
+                return
+            for key in self.rb.getKeys(self.keyList, waitRelease=self.waitRelease):
+                self.events.append((self.keyMap[key.name], key))
+
+    # Background thread: poll response device while collecting
+    def _run(self):
+        while True:
+            self.collecting.wait()
+            self._poll()
+            time.sleep(self.pollInterval)
@@ -0,0 +1,125 @@
+"""
+Selective Stopping Toolbox (SeleST)
+
+    SeleST_profile
+        Classes for timing each stage of the trial pipeline can be found in this script
+
+        When 'Profile task stages?' is selected, every stage function of SeleST_run (see stages below) is replaced by a
+        timed version while the blocks of a paradigm are run (see SeleST_run.runTask, which always restores them). The
+        wall time (time.perf_counter) and CPU time (time.process_time) of every call are stored in preallocated arrays,
+        and a report with percentiles for each stage is printed and saved to *_profile.txt at the end of the paradigm.
+        Stages that wait on purpose (e.g., ITI, feedback, fixationPeriod and the end-of-block break) have long wall
+        times by design: their jitter (spread of wall times) and CPU times show where overhead comes from. runTrial and
+        stop_signal are called on every frame.
+        When 'Profile blocks with cProfile?' is also selected, each block is profiled with cProfile and saved to
+        *_block<n>.prof (can be opened with pstats or snakeviz).
+        When profiling is not selected, the stage functions are left unchanged, so there is no cost during the task.
+
+    See the SeleST.py script for general information on the task
+"""
+
+# Import required modules
+import time
+import cProfile
+import functools
+import numpy as np
+from lib import SeleST_data, SeleST_run
+
+stages = ['Initialize_trial', 'Start_Trial', 'fixationPeriod', 'runTrial', 'stop_signal', 'getRT', 'feedback',
+    'staircaseSSD', 'saveData', 'ITI', 'endBlock'] # stage functions of SeleST_run that are timed
+
+# Create Profiler class
+#   Times the stages of the trial pipeline (see above). The timed versions are installed and removed by
+#   SeleST_run.runTask, and the report is saved by close (see SeleST_run.endParadigm).
+class Profiler:
+    def __init__(self, exp, capacity=1024):
+        self.exp = exp
+        self.enabled = exp.advSettings.get('Profile task stages?') == True
+        self.blockProfile = self.enabled and exp.advSettings.get('Profile blocks with cProfile?') == True
+        self.save = exp.taskInfo['Save data?'] == True
+        self.profile = None
+        self.originals = []
+        if self.enabled:
+            # Preallocate arrays (in ms) for every stage, these grow if a stage is called more often
+            self.wallTimes = np.zeros((len(stages), capacity))
+            self.cpuTimes = np.zeros((len(stages), capacity))
+            self.counts = np.zeros(len(stages), dtype=int)
+
+    # Replace the stage functions of SeleST_run with timed versions (if profiling is selected)
+    def install(self):
+        if not self.enabled or self.originals:
+            return
+        for index, name in enumerate(stages):
+            function = getattr(SeleST_run, name)
+            self.originals.append((name, function))
+            setattr(SeleST_run, name, self.timed(index, function))
+
+    # Restore the original stage functions (and stop cProfile if a block did not finish, e.g., if the task was quit)
+    def uninstall(self):
+        if self.profile is not None:
+            self.profile.disable()
+            self.profile = None
+        for name, function in self.originals:
+            setattr(SeleST_run, name, function)
+        self.originals = []
+
+    # Return a version of function that records its wall and CPU time as stage index
+    def timed(self, index, function):
+        @functools.wraps(function)
+        def timedFunction(*args, **kwargs):
+            wallStart, cpuStart = time.perf_counter(), time.process_time()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                self.record(index, time.perf_counter() - wallStart, time.process_time() - cpuStart)
+        return timedFunction
+
+    def record(self, index, wallTime, cpuTime):
+        n = self.counts[index]
+        if n == self.wallTimes.shape[1]: # grow arrays if needed
+            self.wallTimes = np.concatenate([self.wallTimes, np.zeros(self.wallTimes.shape)], axis=1)
+            self.cpuTimes = np.concatenate([self.cpuTimes, np.zeros(self.cpuTimes.shape)], axis=1)
+        self.wallTimes[index, n] = wallTime*1000
+        self.cpuTimes[index, n] = cpuTime*1000
+        self.counts[index] = n + 1
+
+    # Start profiling a block with cProfile (called by SeleST_run.runBlocks before the first trial of a block)
+    def startBlock(self, trialInfo):
+        if self.blockProfile:
+            self.profile = cProfile.Profile()
+            self.profile.enable()
+
+    # Stop profiling the block and save the profile (called by SeleST_run.endBlock, before the end-of-block break)
+    def endBlock(self, trialInfo):
+        if self.profile is None:
+            return
+        self.profile.disable()
+        if self.save:
+            self.profile.dump_stats(self.exp.Output+'_block%s.prof'%trialInfo.blockCount)
+        self.profile = None
+
+    # Return the report of all stages (one line per stage, times in ms)
+    def report(self):
+        lines = ['stage nCalls totalWall meanWall sdWall p50Wall p90Wall p99Wall maxWall meanCPU p99CPU maxCPU\n']
+        for index, name in enumerate(stages):
+            n = self.counts[index]
+            if n == 0:
+                continue
+            wall = self.wallTimes[index, :n]
+            cpu = self.cpuTimes[index, :n]
+            p50, p90, p99 = np.percentile(wall, [50, 90, 99])
+            lines.append('%s %s %.1f %.3f %.3f %.3f %.3f %.3f %.3f %.3f %.3f %.3f\n'%(name, n, wall.sum(), wall.mean(), wall.std(),
+                p50, p90, p99, wall.max(), cpu.mean(), np.percentile(cpu, 99), cpu.max()))
+        return lines
+
+    # Remove the timed stage functions, print the report and save it (if save data is selected)
+    def close(self):
+        if not self.enabled:
+            return
+        self.uninstall() # already restored by SeleST_run.runTask unless close is called during the task
+        lines = self.report()
+        print('Stage timing (ms):\n' + ''.join(lines))
+        if self.save:
+            writer = SeleST_data.DataWriter(self.exp.Output+'_profile.txt', mode='w')
+            writer.write(''.join(lines))
+            writer.close()
@@ -8,28 +8,79 @@ Selective Stopping Toolbox (SeleST)
 """
 
 # Import required modules
-from random import shuffle, uniform
-from psychopy import event, core, visual
+from random import uniform
+import numpy as np
+from psychopy import event, core
 from psychopy.constants import PRESSED
-import psychtoolbox as ptb
-from psychopy import sound
+from lib import SeleST_trials
+
+# Define runTask function
+#   Here the task is run (see runBlocks). The trial stimuli from the final trial are returned so that they can be
+#   cleared by endTask.
+def runTask(exp,stimuli,trialInfo,stopInfo):
+    exp.profiler.install() # time each stage of the trial pipeline if selected (see SeleST_profile)
+    try:
+        return runBlocks(exp,stimuli,trialInfo,stopInfo)
+    finally:
+        exp.profiler.uninstall() # always restore the stage functions (e.g., if the task is quit or an error occurs)
+
+# Define runBlocks function
+#   Here the task is run by looping over blocks and trials
+def runBlocks(exp,stimuli,trialInfo,stopInfo):
+    blockList, resumeTrials = trialInfo.blockList, None
+    if exp.resume is not None: # continue an unfinished session from the next trial (see SeleST_checkpoint)
+        blockList, resumeTrials = exp.resume.restore(exp, trialInfo, stopInfo)
+    for thisBlock in blockList: # iterate over blocks
+        if resumeTrials is not None: # remaining trials of the block that was interrupted
+            thisBlockTrials, resumeTrials = resumeTrials, None
+        else:
+            thisBlockTrials = Block(exp, trialInfo) # process trials in the current block
+            exp.checkpoint.startBlock(trialInfo, thisBlockTrials) # save trial order and choices of the block
+        exp.profiler.startBlock(trialInfo) # start cProfile for the block if selected
+        for trial in thisBlockTrials: # iterate over trials in the current block
+            trialInfo.trialCount = trialInfo.trialCount + 1 # track trial number
+            thisTrial = Initialize_trial(exp, trialInfo, stopInfo, trial) # set parameters of current trial
+            print('Trial number %s'%(trialInfo.trialCount) + ' - ' + thisTrial.trialName) # print trial number & name to console
+            trialStimuli = Start_Trial(exp,stimuli,trialInfo,thisTrial,trial) # set additional trial related parameters
+            exp.win.flip() # draw stimuli at start of trial
+            fixPeriod = fixationPeriod(exp,stimuli,trialStimuli) # run fixation period
+            if exp.taskInfo['Response mode'] == 'Wait-and-press': # clear events in buffer if wait-and-press version
+                exp.rb.clearEvents()
+            startTime = round(exp.globalClock.getTime(),1) # record trial start time and print it to the console
+            print('Trial started at %s seconds'%startTime)
+            trialTimer = core.CountdownTimer(exp.advSettings['Trial length (s)']) # set trial timer
+            stopTimer = core.CountdownTimer(thisTrial.stopTime/1000) # set stop timer
+            exp.win.callOnFlip(exp.rb.clock.reset)
+            exp.win.callOnFlip(exp.input.start) # start collecting responses at trial onset
+            exp.frameLog.startTrial(thisTrial) # start monitoring frame timing
+            while trialTimer.getTime() > 0: # run trial while timer is positive
+                runTrial(exp,stimuli,thisTrial,trialStimuli,trialTimer)
+                if stopTimer.getTime() <= 0: # present stop signal when stop timer reaches 0
+                    stop_signal(exp,stimuli,thisTrial,trialStimuli)
+                exp.frameLog.flip() # update stimuli on every frame (and record frame timing)
+            exp.input.stop() # stop collecting responses
+            exp.frameLog.endTrial(trialInfo) # save frame timing for current trial
+            getRT(exp, thisTrial, trialStimuli) # get RTs for current trial
+            feedback(exp, stimuli, trialInfo, thisTrial, trialStimuli) # calculate response accuracy and present feedback
+            staircaseSSD(exp, stopInfo, thisTrial) # staircase SSD if applicable
+            exp.sessionStats.update(trialInfo, stopInfo, thisTrial) # update running performance statistics
+            saveData(exp, trialInfo, thisTrial, startTime) # save data from current trial
+            exp.checkpoint.endTrial(trialInfo, stopInfo, thisTrial) # save state so the session can be resumed from the next trial
+            ITI(exp, stimuli, trialStimuli) # end trial and run the intertrial interval
+        endBlock(exp, trialInfo, thisBlockTrials) # calculate block score and present end-of-block feedback
+    exp.checkpoint.complete() # all blocks have been completed
+    return trialStimuli
 
 # Define Block function
 #   Here the trial list for a given block is generated
 def Block(exp,trialInfo):
-    # Shuffle trials on a block-by-block basis
-    if exp.taskInfo['Import trials?'] == False: # don't shuffle trials if they have been imported
-        shuffleTrials = True
-        while shuffleTrials == True: # shuffle until go criterion is achieved
-            thisBlockTrials = trialInfo.trialList
-            shuffle(thisBlockTrials)
-            if sum(thisBlockTrials[:exp.genSettings['n forced go trials']]) > exp.genSettings['n forced go trials']: # reshuffle trials if n forced go criterion is not met
-                thisBlockTrials = shuffle(thisBlockTrials)
-            elif sum(thisBlockTrials[:exp.genSettings['n forced go trials']]) <= exp.genSettings['n forced go trials']: # break loop if n forced go criterion is achieved
-                break         
+    # Order trials on a block-by-block basis
+    if exp.taskInfo['Import trials?'] == False: # don't reorder trials if they have been imported
+        order = SeleST_trials.sequenceBlock(trialInfo.trialList, exp.genSettings['n forced go trials'], exp.genSettings['Max stop trials in a row'],
+            exp.genSettings['Min trials between same stop type'], trialInfo.rng) # build an order that meets the constraints directly (see SeleST_trials)
+        thisBlockTrials = [trialInfo.trialList[i] for i in order]
     elif exp.taskInfo['Import trials?'] == True: # use imported trials if option is selected
         thisBlockTrials = trialInfo.blockTrials[trialInfo.blockCount] # start from 0 to account for zero-based array index
-    shuffle(trialInfo.choiceList) # shuffle choice list
     # Add instructions for practice go-only and go/stop blocks if practice is enabled
     if exp.taskInfo['Include practice?'] == True:
         if exp.practiceGo == True: # practice go (coded as block -1 in data file)
@@ -51,6 +102,11 @@ def Block(exp,trialInfo):
             exp.win.flip()
             exp.rb.waitKeys(keyList=['space'])
     exp.practiceGo = False # go-only practice is complete
+    if exp.genSettings['Balance choices across trial types?'] == True: # give each trial type an equal number of each choice
+        trialTypes = [trial['trialType'] if isinstance(trial, (dict, np.void)) else trial for trial in thisBlockTrials]
+        trialInfo.choiceList = SeleST_trials.assignChoices(trialTypes, trialInfo.choiceList, trialInfo.rng)
+    else:
+        trialInfo.rng.shuffle(trialInfo.choiceList) # shuffle choice list
     trialInfo.blockTrialCount = 0 # reset block trial count
     trialInfo.blockCount = trialInfo.blockCount + 1 # track block number
     print('Starting block %s'%(trialInfo.blockCount)) # print block number to console
@@ -61,11 +117,10 @@ def Block(exp,trialInfo):
 #   Here information for the given trial is obtained and counters are reset
 class Initialize_trial:
     def __init__(self,exp,trialInfo,stopInfo,trial):
-        if exp.taskInfo['Import trials?'] == True: # if parameters are specified in imported trials file
-            thisTrial = trialInfo.trialList[trialInfo.trialCount-1]
-            self.trialName = thisTrial['trialName']
-            self.trialType = thisTrial['trialType']
-            self.staircase = thisTrial['ssd']
+        if isinstance(trial, (dict, np.void)): # if parameters are specified in imported trials file (practice go trials are not imported)
+            self.trialName = str(trial['trialName'])
+            self.trialType = int(trial['trialType'])
+            self.staircase = int(trial['ssd'])
         else:
             self.trialType = trial # use GUI information if no imported trials
             if self.trialType == 1: # if go
@@ -84,14 +139,10 @@ class Initialize_trial:
         self.stopSignal = True # flag whether to present stop signal
         
         # Reset dynamic parameters
-        self.L_RT_array = [] # NOTE: arrays are set for each response key so multiple presses can be accounted for in a trial
-        self.R_RT_array = []
-        self.L2_RT_array = []
-        self.R2_RT_array = []
-        self.L_duration = 0
-        self.R_duration = 0
-        self.L2_duration = 0
-        self.R2_duration = 0
+        self.RT_arrays = [[],[],[],[]] # NOTE: arrays are set for each response key (L, R, L2, R2) so multiple presses can be accounted for in a trial
+        self.L_RT_array, self.R_RT_array, self.L2_RT_array, self.R2_RT_array = self.RT_arrays
+        self.durations = [0,0,0,0] # key press durations (L, R, L2, R2)
+        self.keyEvents = [] # every key press of the trial as (response index, key), saved as key-down/key-up events by saveData
         self.RTs = [float("nan"),float("nan"),float("nan"),float("nan")] # set RTs as NaNs
         self.pressState = [0,0,0,0] # set press states as 0 (i.e., no press)
         self.stopSuccess = 0 # set to stop success as 0
@@ -102,10 +153,10 @@ class Start_Trial:
     def __init__(self,exp,stimuli,trialInfo,thisTrial,trial):
         trialInfo.blockTrialCount = trialInfo.blockTrialCount + 1
         if exp.taskInfo['Import trials?'] == True and trialInfo.blockCount > 0: # use imported trial information if selected (additional variables to change trial-by-trial should be inserted below, e.g., L_targetTime & R_targetTime)
-            exp.advSettings['Go color'] = trial['go_color']
-            exp.advSettings['Stop color'] = trial['stop_color']
-            stimuli.L_cue.lineColor = trial['L_cue_color']
-            stimuli.R_cue.lineColor = trial['R_cue_color']
+            exp.advSettings['Go color'] = str(trial['go_color'])
+            exp.advSettings['Stop color'] = str(trial['stop_color'])
+            stimuli.L_cue.lineColor = str(trial['L_cue_color'])
+            stimuli.R_cue.lineColor = str(trial['R_cue_color'])
             # thisTrial.L_targetTime = trial['L_targetTime'] # example custom variable to run a decoupling response inhibition experiment (e.g., Wadsley et al., 2022, J Neurphysiol, https://doi.org/10.1152/jn.00495.2021)
             # thisTrial.R_targetTime = trial['R_targetTime']
         else: # use GUI if not importing trials 
@@ -136,6 +187,17 @@ class Start_Trial:
                 self.R_fillLimit = 1           
             self.fillTimes = [self.L_fillTime/1000, self.R_fillTime/1000]*2 # duplicate fill times for choice RT (NOTE: this can be individualised if wanting to use >2 response options)
             self.fillLimits = [self.L_fillLimit, self.R_fillLimit] *2 # same as above
+            # Precompute the size and position of each filling bar for every frame of the trial so that runTrial only needs to look them up
+            self.frameLength = exp.frameDur/1000 # frame duration (s)
+            self.nFrames = int(np.ceil(exp.advSettings['Trial length (s)']/self.frameLength)) + 1 # number of frames in trial (+1 to include the final frame)
+            frameTimes = np.arange(self.nFrames)*self.frameLength # time since trial onset at each frame
+            fillPropn = np.minimum(frameTimes[:,None]/np.array(self.fillTimes), np.array(self.fillLimits)) # fill proportion of each bar at each frame (limited to fill limits)
+            self.fillSizes = np.empty((self.nFrames,len(self.fillTimes),2)) # frame x stimulus x (width, height)
+            self.fillSizes[:,:,0] = exp.advSettings['Stimulus width (cm)']
+            self.fillSizes[:,:,1] = exp.advSettings['Stimulus size (cm)']*fillPropn
+            self.fillPositions = np.empty((self.nFrames,len(self.fillTimes),2)) # frame x stimulus x (x, y)
+            self.fillPositions[:,:,0] = stimuli.xStimPos
+            self.fillPositions[:,:,1] = -(1-fillPropn)*(exp.advSettings['Stimulus size (cm)']/2)
         self.stimList = [stimuli.L_stim, stimuli.R_stim, stimuli.L_stim2, stimuli.R_stim2] # set list of stimuli to observe during a trial
         # Set draw status of stimuli based on choice option
         # NOTE: the draw options for choices can modified below
@@ -198,54 +260,25 @@ def fixationPeriod(exp,stimuli,trialStimuli):
     return fixPeriod
                                     
 def runTrial(exp,stimuli,thisTrial,trialStimuli,trialTimer):
-    # Set up keys to track for left and right responses based on task version (hold-and-release vs wait-and-press)
-    if exp.taskInfo['Response mode'] == 'Hold-and-release' and exp.genSettings['Use response box?'] == False: 
-        allKeys = exp.rb.getKeys([exp.advSettings['Left response key'],exp.advSettings['Right response key'], exp.advSettings['Left 2 response key'],exp.advSettings['Right 2 response key'],'q','escape'], waitRelease = True)
-    elif exp.genSettings['Use response box?'] == True: # use input from response box
-        # E.g.
-        # allKeys = rb.getKeys()
-        pass
-    else:
-        allKeys = exp.rb.getKeys([exp.advSettings['Left response key'],exp.advSettings['Right response key'], exp.advSettings['Left 2 response key'],exp.advSettings['Right 2 response key'], 'q','escape'], waitRelease = False) # use keyboard with key press
-    # Monitor key presses during trial
-    for thisKey in allKeys:
-         if thisKey==exp.L_resp_key: # left response
-             thisTrial.L_RT_array.append(thisKey.rt) # store time-based RT
-             thisTrial.L_duration = thisKey.duration # store duration for hold-and-release version
-             if exp.taskInfo['Paradigm'] == 'ARI':
-                 trialStimuli.drawStatus[0] = False # stop drawing associated stimulus
-             thisTrial.pressState[0] = 1 # L key was pressed
-         elif thisKey==exp.R_resp_key: # right response
-             thisTrial.R_RT_array.append(thisKey.rt)
-             thisTrial.R_duration = thisKey.duration
-             if exp.taskInfo['Paradigm'] == 'ARI':
-                 trialStimuli.drawStatus[1] = False
-             thisTrial.pressState[1] = 1
-         elif thisKey==exp.L2_resp_key: # left 2 response
-             thisTrial.L2_RT_array.append(thisKey.rt)
-             thisTrial.L2_duration = thisKey.duration
-             if exp.taskInfo['Paradigm'] == 'ARI':
-                 trialStimuli.drawStatus[2] = False
-             thisTrial.pressState[2] = 1
-         elif thisKey==exp.R2_resp_key: # right 2 response
-             thisTrial.R2_RT_array.append(thisKey.rt)
-             thisTrial.R2_duration = thisKey.duration
-             if exp.taskInfo['Paradigm'] == 'ARI':
-                 trialStimuli.drawStatus[3] = False
-             thisTrial.pressState[3] = 1
-         elif thisKey in ['q', 'escape']: # monitor for esc or q press
-             endTask(exp,stimuli,trialStimuli)
+    # Monitor key presses during trial (keys are collected and mapped to responses by exp.input, see SeleST_input)
+    for respIndex, thisKey in exp.input.getEvents():
+        if respIndex < 0: # monitor for esc or q press
+            endTask(exp,stimuli,trialStimuli)
+        thisTrial.RT_arrays[respIndex].append(thisKey.rt) # store time-based RT
+        thisTrial.keyEvents.append((respIndex, thisKey)) # keep all presses (not just the first) for the response event file
+        thisTrial.durations[respIndex] = thisKey.duration # store duration for hold-and-release version
+        if exp.taskInfo['Paradigm'] == 'ARI':
+            trialStimuli.drawStatus[respIndex] = False # stop drawing associated stimulus
+        thisTrial.pressState[respIndex] = 1 # key was pressed
     
     # ARI
     if exp.taskInfo['Paradigm'] == 'ARI': # draw filling bars for ARI paradigm
-        t = trialTimer.getTime() # grab time for current loop
+        t = exp.advSettings['Trial length (s)'] - trialTimer.getTime() # grab time since trial onset for current loop
+        frame = min(int(t/trialStimuli.frameLength), trialStimuli.nFrames-1) # last precomputed frame that has already elapsed (see Start_Trial), so bars are never ahead of time
         for i, stim in enumerate(trialStimuli.stimList): # loop over trial stimuli
             if trialStimuli.drawStatus[i] == True: # if stimuli should be updated
-                fillPropn = (exp.advSettings['Trial length (s)']-t)/trialStimuli.fillTimes[i] # calculate current fill proportion based on time
-                if fillPropn >= trialStimuli.fillLimits[i]: # if fill propn greater than limit, set fill propn to limit
-                    fillPropn = trialStimuli.fillLimits[i]
-                stim.size = (exp.advSettings['Stimulus width (cm)'], exp.advSettings['Stimulus size (cm)']*fillPropn) # update stimulus size
-                stim.pos = (stimuli.xStimPos[i],-(1-fillPropn)*(exp.advSettings['Stimulus size (cm)']/2)) # update stimulus position
+                stim.size = trialStimuli.fillSizes[frame,i] # update stimulus size
+                stim.pos = trialStimuli.fillPositions[frame,i] # update stimulus position
                 stim.setAutoDraw(True) # draw stimulus
 
     elif exp.taskInfo['Paradigm'] == 'SST': # draw go stimulus for SST paradigm
@@ -271,28 +304,12 @@ def stop_signal(exp,stimuli,thisTrial,trialStimuli):
 # Define getRT function
 #   Function for processing and storing RTs on a given trial
 def getRT(exp,thisTrial,trialStimuli):   
-    for i, respKey in enumerate(trialStimuli.stimList): # loop over response keys
+    for i, respKey in enumerate(trialStimuli.stimList): # loop over response keys (L, R, L2, R2)
         if thisTrial.pressState[i] == 1: # if key was pressed
-            if i == 0: # L_resp
-                if exp.taskInfo['Response mode'] == 'Hold-and-release':
-                    thisTrial.RTs[i] = round((thisTrial.L_RT_array[0] + thisTrial.L_duration) * 1000,1)
-                else:
-                    thisTrial.RTs[i] = round(thisTrial.L_RT_array[0] * 1000,1)
-            elif i == 1: # R_resp
-                if exp.taskInfo['Response mode'] == 'Hold-and-release':
-                    thisTrial.RTs[i] = round((thisTrial.R_RT_array[0] + thisTrial.R_duration) * 1000,1)
-                else:
-                    thisTrial.RTs[i] = round(thisTrial.R_RT_array[0] * 1000,1)    
-            elif i == 2: # L_resp2
-                if exp.taskInfo['Response mode'] == 'Hold-and-release':
-                    thisTrial.RTs[i] = round((thisTrial.L2_RT_array[0] + thisTrial.L2_duration) * 1000,1)
-                else:
-                    thisTrial.RTs[i] = round(thisTrial.L2_RT_array[0] * 1000,1)
-            elif i == 3: # R_resp2
-                if exp.taskInfo['Response mode'] == 'Hold-and-release':
-                    thisTrial.RTs[i] = round((thisTrial.R2_RT_array[0] + thisTrial.R2_duration) * 1000,1)
-                else:
-                    thisTrial.RTs[i] = round(thisTrial.R2_RT_array[0] * 1000,1)  
+            if exp.taskInfo['Response mode'] == 'Hold-and-release':
+                thisTrial.RTs[i] = round((thisTrial.RT_arrays[i][0] + thisTrial.durations[i]) * 1000,1)
+            else:
+                thisTrial.RTs[i] = round(thisTrial.RT_arrays[i][0] * 1000,1)
                     
     print('Trial RTs were %s ms' %thisTrial.RTs) # print RTs to console
 
@@ -363,25 +380,29 @@ def feedback(exp,stimuli,trialInfo,thisTrial,trialStimuli):
         thisTrial.stopSuccess = 0
 
 # Define staircaseSSD function
-#   Function for adjusting SSD based on stop success
+#   Function for adjusting SSD based on stop success (using the SSD policy selected in general settings, see SeleST_ssd)
 def staircaseSSD(exp,stopInfo,thisTrial): 
     if exp.genSettings['Staircase stop-signal delays?'] == True: # only staircase if option is enabled
         if thisTrial.trialType > 1: # if stop trial
             outcome = 'successful' if thisTrial.stopSuccess else 'unsuccessful'
             print(f'Stop time was {thisTrial.stopTime} and was {outcome}') # print stop time and outcome of current trial to console
-            if thisTrial.stopSuccess == 1: # if successful stop trial
-                if not stopInfo.stopTimeArray[thisTrial.staircase] + stopInfo.strcaseTime > (thisTrial.L_targetTime - exp.advSettings['Upper stop-limit (ms)']):
-                    stopInfo.stopTimeArray[thisTrial.staircase] = stopInfo.stopTimeArray[thisTrial.staircase] + stopInfo.strcaseTime
-            elif thisTrial.stopSuccess == 0: # if unsuccessful stop trial
-                if not stopInfo.stopTimeArray[thisTrial.staircase] - stopInfo.strcaseTime < exp.advSettings['Lower stop-limit (ms)']:
-                    stopInfo.stopTimeArray[thisTrial.staircase] = stopInfo.stopTimeArray[thisTrial.staircase] - stopInfo.strcaseTime
+            stopInfo.policy.update(stopInfo.stopTimeArray, thisTrial.staircase, thisTrial.stopSuccess, thisTrial.stopTime) # set SSD for next trial of this staircase
                     
 # Define saveData function
 #   Function for saving data after each trial
 def saveData(exp,trialInfo,thisTrial,startTime):
     if exp.taskInfo['Save data?'] == True: # save data if option is selected
-        with open(exp.Output+'.txt', 'a') as b:
-            b.write('%s %s %s %s %s %s %s %s %s %s %s %s %s %s %s %s %s\n'%(trialInfo.blockCount, trialInfo.trialCount, startTime, thisTrial.trialName, thisTrial.trialType, thisTrial.stopTime,thisTrial.L_targetTime, thisTrial.R_targetTime, trialInfo.choiceList[trialInfo.blockTrialCount-1], thisTrial.pressState[0], thisTrial.pressState[1], thisTrial.pressState[2], thisTrial.pressState[3], thisTrial.RTs[0], thisTrial.RTs[1], thisTrial.RTs[2], thisTrial.RTs[3]))
+        record = (trialInfo.blockCount, trialInfo.trialCount, startTime, thisTrial.trialName, thisTrial.trialType, thisTrial.stopTime,thisTrial.L_targetTime, thisTrial.R_targetTime, trialInfo.choiceList[trialInfo.blockTrialCount-1], thisTrial.pressState[0], thisTrial.pressState[1], thisTrial.pressState[2], thisTrial.pressState[3], thisTrial.RTs[0], thisTrial.RTs[1], thisTrial.RTs[2], thisTrial.RTs[3])
+        exp.dataWriter.write('%s %s %s %s %s %s %s %s %s %s %s %s %s %s %s %s %s\n'%record) # queue data to be written to file in the background
+        if exp.arrayWriter is not None: # typed copy of the data (see SeleST_data.ArrayWriter)
+            exp.arrayWriter.write(record)
+        if exp.eventWriter is not None: # key-down and key-up times (ms from trial onset) of every key press
+            lines = []
+            for respIndex, key in thisTrial.keyEvents:
+                lines.append('%s %s %s %s down %.1f\n'%(trialInfo.blockCount, trialInfo.trialCount, respIndex, key.name, key.rt*1000))
+                if key.duration is not None: # release time is only known once the key has been released
+                    lines.append('%s %s %s %s up %.1f\n'%(trialInfo.blockCount, trialInfo.trialCount, respIndex, key.name, (key.rt + key.duration)*1000))
+            exp.eventWriter.write(''.join(lines))
 
 # Define ITI function
 #   Function for ending the trial and running intertrial interval 
@@ -411,46 +432,29 @@ def ITI(exp, stimuli, trialStimuli):
 #   Function for presenting end-of-block feedback
 def endBlock(exp,trialInfo,thisBlockTrials):
     print('End of block %s'%trialInfo.blockCount)
+    exp.frameLog.endBlock(trialInfo) # save frame timing summary for the block
+    exp.sessionStats.endBlock(trialInfo) # print and save performance summary for the block
+    exp.profiler.endBlock(trialInfo) # save cProfile of the block if selected
+    if exp.taskInfo['Save data?'] == True: # make sure all data from the block are on disk before the break
+        exp.dataWriter.sync()
+        if exp.arrayWriter is not None:
+            exp.arrayWriter.sync()
+        if exp.eventWriter is not None:
+            exp.eventWriter.sync()
     if trialInfo.blockCount > 0:
         trialInfo.totalScore = trialInfo.totalScore + trialInfo.blockScore # update total score    
-        # Create text stimuli for feedback
-        blockEnd = visual.TextStim(exp.win, pos=[0,3], height=1, color= [1,1,1],
-            text='End of block %s!'%(trialInfo.blockCount), units='cm' )
-        scoreBreakdown = visual.TextStim(exp.win, pos=[0,1.5], height=1, color= [1,1,1],
-            text='Score breakdown:', units='cm' )     
-        prevBlockFeedback = visual.TextStim(exp.win, pos=[0,0], height=1, color= [1,1,1],
-            text='Previous block: -', units='cm' )        
-        if trialInfo.blockCount > 1:
-            prevBlockFeedback = visual.TextStim(exp.win, pos=[0, 0.0], height=1, color= [1,1,1],
-                text='Previous block: %s points'%(trialInfo.prevBlockScore), units='cm' )
-        thisBlockFeedback = visual.TextStim(exp.win, pos=[0, -1.5], height=1, color= [1,1,1],
-            text='This block: %s points'%(trialInfo.blockScore), units='cm' )
-        totalScoreFeedback = visual.TextStim(exp.win, pos=[0, -3], height=1, color= [1,1,1],
-            text='Total: %s points'%(trialInfo.totalScore), units='cm' )
-        instrFeedback = visual.TextStim(exp.win, pos=[0, -5], height=1, color= [1,1,1],
-            text='Press the space key to continue', units='cm' )        
-        event.clearEvents() # clear event buffer
-        while not event.getKeys('space'):
-            blockEnd.draw()
-            instrFeedback.draw()
-            scoreBreakdown.draw()
-            thisBlockFeedback.draw()
-            totalScoreFeedback.draw()
-            prevBlockFeedback.draw()
-            exp.win.flip()
+        exp.blockEndScreen.show(trialInfo) # present feedback (see SeleST_initialize.BlockEndScreen)
+        exp.rb.clearEvents() # clear key buffer
+        exp.rb.waitKeys(keyList=['space']) # wait for participant to continue (screen stays up without redrawing)
         trialInfo.prevBlockScore = trialInfo.blockScore
         trialInfo.blockScore = 0
+    exp.checkpoint.endBlock(trialInfo) # save scores
     
 # Define endTask function
 #   Function for ending the task and closing relevant serial/com ports
 def endTask(exp, stimuli, trialStimuli):
     print('Ending task')
-    for s in stimuli.eStimList:
-        s.setAutoDraw(False)
-    for s in trialStimuli.stimList:
-        s.setAutoDraw(False)
-    for s in trialStimuli.cueList:
-        s.lineColor = exp.advSettings['Cue color']
+    endParadigm(exp, stimuli, trialStimuli)
     exp.instr_5_taskEnd.draw()
     exp.win.flip()
     exp.rb.waitKeys(keyList=['space'])
@@ -466,3 +470,25 @@ def endTask(exp, stimuli, trialStimuli):
         pass                                   
     exp.win.close()
     core.quit()
+
+# Define endParadigm function
+#   Function for clearing stimuli and closing data files at the end of a paradigm (called by endTask, and between
+#   paradigms when several paradigms are run in one session, see SeleST_session)
+def endParadigm(exp, stimuli, trialStimuli):
+    exp.input.stop()
+    for s in stimuli.eStimList:
+        s.setAutoDraw(False)
+    for s in trialStimuli.stimList:
+        s.setAutoDraw(False)
+    for s in trialStimuli.cueList:
+        s.lineColor = exp.advSettings['Cue color']
+    if exp.taskInfo['Save data?'] == True: # write any remaining data to disk and close the data file
+        exp.dataWriter.close()
+        if exp.arrayWriter is not None:
+            exp.arrayWriter.close()
+        if exp.eventWriter is not None:
+            exp.eventWriter.close()
+    exp.frameLog.close()
+    exp.sessionStats.close()
+    exp.checkpoint.close()
+    exp.profiler.close()
@@ -0,0 +1,122 @@
+"""
+Selective Stopping Toolbox (SeleST)
+
+    SeleST_schedule
+        Functions for compiling imported trials files (see SeleST_trialArrayCreator.py) into trial schedules can be
+        found in this script
+
+        A trials file is checked before the task starts (trial types, stop-signal delays, colours and number of blocks)
+        and all problems are reported at once with their line numbers. The checked file is saved as a typed NumPy array
+        (a schedule) in a 'schedules' folder next to the trials file, so it only needs to be checked and converted again
+        when the trials file (or the number of blocks) changes. Trials files can also be checked before testing by
+        running this script, e.g.: python lib/SeleST_schedule.py 12 conditions/example_trials_1.csv
+
+    See the SeleST.py script for general information on the task
+"""
+
+# Import required modules
+import os
+import re
+import sys
+import csv
+import hashlib
+import numpy as np
+from psychopy import colors
+
+scheduleVersion = 1 # NOTE: increase when the checks or the schedule format change so that schedules are compiled again
+requiredColumns = ['trialName', 'trialType', 'ssd', 'go_color', 'stop_color', 'L_cue_color', 'R_cue_color']
+colorColumns = ['go_color', 'stop_color', 'L_cue_color', 'R_cue_color']
+trialTypes = {1: 'go', 2: 'stop-both', 3: 'stop-left', 4: 'stop-right'}
+maxErrors = 20 # maximum number of problems to list
+
+# Create ScheduleError class
+#   Raised when a trials file cannot be used (the message lists every problem that was found)
+class ScheduleError(ValueError):
+    pass
+
+# Check whether a colour can be used by PsychoPy (colour name or hex code)
+def isColor(value):
+    return value.lower() in colors.colorNames or re.fullmatch(r'#[0-9a-fA-F]{6}', value) is not None
+
+# Check whether a value is a whole number
+def isInteger(value):
+    try:
+        return float(value) == int(float(value))
+    except ValueError:
+        return False
+
+# Define compileSchedule function
+#   Checks a trials file and returns it as a schedule (structured array with one record per trial). nStaircases is the
+#   number of stop-signal delays in SeleST_initialize.SSD.stopTimeArray (valid ssd values are 0 to nStaircases-1).
+def compileSchedule(fileName, nBlocks, nStaircases=4):
+    with open(fileName, 'r', newline='', encoding='utf-8-sig') as f:
+        reader = csv.DictReader(f)
+        columns = reader.fieldnames or []
+        rows = list(reader)
+    errors = []
+    missing = [column for column in requiredColumns if column not in columns]
+    if missing:
+        errors.append('missing column(s): %s' % ', '.join(missing))
+    else:
+        for line, row in enumerate(rows, start=2): # line 1 is the header
+            if not isInteger(row['trialType']) or int(float(row['trialType'])) not in trialTypes:
+                errors.append('line %s: trialType must be %s, not %r' % (line, ', '.join('%s (%s)' % t for t in trialTypes.items()), row['trialType']))
+            if not isInteger(row['ssd']) or not 0 <= int(float(row['ssd'])) < nStaircases:
+                errors.append('line %s: ssd must be a stop-signal delay index from 0 to %s, not %r' % (line, nStaircases-1, row['ssd']))
+            for column in colorColumns:
+                if not isColor(row[column]):
+                    errors.append('line %s: %s %r is not a colour name or hex code (e.g., #00ffff)' % (line, column, row[column]))
+        if len(rows) == 0:
+            errors.append('file contains no trials')
+        elif len(rows) % nBlocks != 0:
+            errors.append('%s trials cannot be split evenly into %s blocks' % (len(rows), nBlocks))
+    if errors:
+        more = ['... and %s more problem(s)' % (len(errors) - maxErrors)] if len(errors) > maxErrors else []
+        raise ScheduleError('Trials file %s cannot be used:\n    %s' % (fileName, '\n    '.join(errors[:maxErrors] + more)))
+
+    # Convert to typed columns (additional columns are kept as numbers if possible, otherwise as text)
+    fields = []
+    for column in columns:
+        values = [row[column] for row in rows]
+        if column in ('trialType', 'ssd'):
+            fields.append((column, 'i1'))
+        elif column not in requiredColumns and all(re.fullmatch(r'[-+]?(\d+\.?\d*|\.\d+)([eE][-+]?\d+)?|nan', v) for v in values):
+            fields.append((column, 'f8'))
+        else:
+            fields.append((column, 'U%s' % max(1, max(len(v) for v in values))))
+    schedule = np.zeros(len(rows), dtype=fields)
+    for column, dtype in fields:
+        values = [row[column] for row in rows]
+        if dtype[0] == 'U':
+            schedule[column] = values
+        else: # numbers are converted via floats so that values such as '1.0' can be used in integer columns
+            schedule[column] = np.array(values, dtype='f8')
+    return schedule
+
+# Define loadSchedule function
+#   Returns the schedule of a trials file, compiling it (see compileSchedule) only if it has not been compiled before.
+#   Compiled schedules are memory-mapped, so loading takes the same (short) time for any number of trials.
+def loadSchedule(fileName, nBlocks, nStaircases=4):
+    with open(fileName, 'rb') as f:
+        key = hashlib.sha256(f.read() + ('|%s|%s|%s' % (nBlocks, nStaircases, scheduleVersion)).encode()).hexdigest()[:16]
+    folder, name = os.path.split(os.path.abspath(fileName))
+    scheduleFile = os.path.join(folder, 'schedules', '%s_%s.npy' % (os.path.splitext(name)[0], key))
+    if not os.path.exists(scheduleFile):
+        schedule = compileSchedule(fileName, nBlocks, nStaircases)
+        os.makedirs(os.path.dirname(scheduleFile), exist_ok=True)
+        with open(scheduleFile + '.tmp', 'wb') as f:
+            np.save(f, schedule)
+        os.replace(scheduleFile + '.tmp', scheduleFile)
+        print('Compiled trials file %s (%s trials)' % (name, len(schedule)))
+    return np.load(scheduleFile, mmap_mode='r')
+
+# Check (and compile) the trials files given on the command line: python lib/SeleST_schedule.py nBlocks file1.csv ...
+if __name__ == '__main__':
+    failed = False
+    for fileName in sys.argv[2:]:
+        try:
+            print('%s: OK (%s trials)' % (fileName, len(loadSchedule(fileName, int(sys.argv[1])))))
+        except ScheduleError as e:
+            print(e)
+            failed = True
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,88 @@
+"""
+Selective Stopping Toolbox (SeleST)
+
+    SeleST_session
+        Functions for running several paradigms (e.g., SST then ARI) one after the other in a single session can be
+        found in this script (see SeleST_multiParadigm.py for an example)
+
+        The GUIs are shown once, and the window, response device, clocks and measured frame rate are kept for the
+        whole session. Only the paradigm-specific settings, stimuli, trials, stop-signal delays and instructions are
+        created again for each paradigm. Each paradigm is saved to its own data files (as when running SeleST.py), with
+        the order of paradigms and the part of the session saved in the taskInfo file ('Session order' and
+        'Session part').
+
+    See the SeleST.py script for general information on the task
+"""
+
+# Import required modules
+from psychopy import visual
+from lib import SeleST_initialize, SeleST_run
+
+sessionKeys = ['genSettings', 'advSettings'] # keys of a paradigm configuration that are not taskInfo settings
+partKeys = ['date', 'frameRate', 'Session part', 'Resume session?', 'Change general settings?'] # taskInfo settings that are not carried over to the next paradigm
+
+# Define carriedSettings function
+#   Returns the settings of the previous paradigm that are carried over to the next paradigm (e.g., settings changed in
+#   the GUIs of the first paradigm). Settings with paradigm-specific defaults (see SeleST_initialize) and settings that
+#   were only given for the previous paradigm (in its configuration) are left out, so these start from the defaults of
+#   the next paradigm.
+def carriedSettings(settings, paradigmDefaults, partSettings):
+    paradigmKeys = set().union(*[defaults.keys() for defaults in paradigmDefaults.values()])
+    return {key: value for key, value in settings.items() if key not in paradigmKeys and key not in partSettings}
+
+# Define runSession function
+#   Runs each configuration in configs in order. A configuration is a dictionary of taskInfo settings for the paradigm
+#   (e.g., {'Paradigm': 'SST', 'RT type': 'Choice', 'Response mode': 'Wait-and-press'}) and can include 'genSettings'
+#   and 'advSettings' dictionaries with settings for that paradigm only. taskInfo, genSettings and advSettings are
+#   used for all paradigms. The GUIs (if showGUI is True) are only shown for the first paradigm; participant details
+#   and settings entered there are used for all paradigms (except settings with paradigm-specific defaults).
+#   If 'Resume session?' is selected, the unfinished paradigm of an earlier session with the same order of paradigms is
+#   resumed (see SeleST_checkpoint) and the session continues with the paradigms after it. Experiment can be replaced
+#   (e.g., by SeleST_headless.Experiment_headless).
+def runSession(_thisDir, configs, taskInfo=None, genSettings=None, advSettings=None, showGUI=True, Experiment=SeleST_initialize.Experiment):
+    order = '->'.join(config['Paradigm'] for config in configs)
+    exp = None
+    start = 0 # first paradigm to run (later than the first paradigm if a session is resumed)
+    for part, config in enumerate(configs):
+        partInfo = {key: value for key, value in config.items() if key not in sessionKeys}
+        partInfo.update({'Session order': order, 'Session part': part + 1})
+        if exp is None: # first paradigm: show GUIs and set up the window and response device
+            exp = Experiment(_thisDir, taskInfo=dict(taskInfo or {}, **partInfo), genSettings=dict(genSettings or {}, **config.get('genSettings', {})),
+                advSettings=dict(advSettings or {}, **config.get('advSettings', {})), showGUI=showGUI)
+            if exp.resume is not None: # continue from the paradigm that was interrupted
+                if exp.taskInfo.get('Session order') != order:
+                    raise ValueError('The unfinished session of participant %s (experiment %s) was not run with the paradigms %s, '
+                        'resume it with SeleST.py or with the same paradigms' % (exp.taskInfo['Participant ID'], exp.taskInfo['Experiment name'], order))
+                start = exp.taskInfo['Session part'] - 1
+        if part < start: # already completed before the session was interrupted
+            continue
+        if part > start: # following paradigms: same participant details, settings, window and response device
+            sharedInfo = {key: value for key, value in exp.taskInfo.items() if key not in partKeys}
+            partGenSettings = {**(genSettings or {}), **carriedSettings(exp.genSettings, SeleST_initialize.paradigmGenDefaults,
+                configs[part-1].get('genSettings', {})), **config.get('genSettings', {})}
+            partAdvSettings = {**(advSettings or {}), **carriedSettings(exp.advSettings, SeleST_initialize.paradigmAdvDefaults,
+                configs[part-1].get('advSettings', {})), **config.get('advSettings', {})}
+            exp = Experiment(_thisDir, taskInfo=dict(sharedInfo, **partInfo), genSettings=partGenSettings,
+                advSettings=partAdvSettings, showGUI=False, shared=exp)
+        print('Starting part %s of %s (%s)' % (part + 1, len(configs), exp.taskInfo['Paradigm']))
+        stimuli = SeleST_initialize.Stimuli(exp)
+        trialInfo = SeleST_initialize.Trials(exp)
+        stopInfo = SeleST_initialize.SSD(exp)
+        trialStimuli = SeleST_run.runTask(exp, stimuli, trialInfo, stopInfo)
+        if part < len(configs) - 1:
+            SeleST_run.endParadigm(exp, stimuli, trialStimuli) # close data files of this paradigm
+            partEnd(exp, part + 1, len(configs))
+    SeleST_run.endTask(exp, stimuli, trialStimuli) # end the session when all paradigms have been completed
+
+# Define partEnd function
+#   Presents a break screen between paradigms and waits for the participant to continue. The text is created the first
+#   time and then shared by the experiments of the following paradigms (see Experiment.shareDevices), so only its text
+#   is updated.
+def partEnd(exp, part, nParts):
+    if getattr(exp, 'partEndText', None) is None:
+        exp.partEndText = visual.TextStim(exp.win, height=1, color=[1,1,1], units='cm', text='')
+    exp.partEndText.text = 'Part %s of %s complete!\n\nPress the space key to continue' % (part, nParts)
+    exp.partEndText.draw()
+    exp.win.flip()
+    exp.rb.clearEvents() # clear key buffer
+    exp.rb.waitKeys(keyList=['space'])
@@ -0,0 +1,65 @@
+"""
+Selective Stopping Toolbox (SeleST)
+
+    SeleST_ssd
+        Policies for adjusting stop-signal delays (SSDs) after each stop trial can be found in this script
+
+        A policy is created by the SSD class (see SeleST_initialize) and updates SSD.stopTimeArray after every stop
+        trial (see SeleST_run.staircaseSSD). Two policies are included:
+            - Staircase: the SSD moves up after a successful stop and down after a failed stop by a fixed step size
+            - Bayesian (QUEST): the SSD at which stopping succeeds on 50% of trials is estimated from all stop trials so
+              far, and the next SSD is set to that estimate (this usually reaches 50% stop success in fewer trials)
+        Other policies can be added by creating a class with the same methods and adding it to policies below.
+
+    See the SeleST.py script for general information on the task
+"""
+
+# Import required modules
+import numpy as np
+
+# Create StaircasePolicy class
+#   Moves the SSD of a staircase by stepSize (ms) after each stop trial. The SSD is not changed if the step would take
+#   it below lowerLimit or above upperLimit (ms from trial onset).
+class StaircasePolicy:
+    def __init__(self, stopTimeArray, stepSize, lowerLimit, upperLimit):
+        self.stepSize = stepSize
+        self.lowerLimit = lowerLimit
+        self.upperLimit = upperLimit
+
+    # Update the SSD of a staircase after a stop trial presented at stopTime
+    def update(self, stopTimeArray, staircase, stopSuccess, stopTime):
+        if stopSuccess == 1: # if successful stop trial
+            if not stopTimeArray[staircase] + self.stepSize > self.upperLimit:
+                stopTimeArray[staircase] = stopTimeArray[staircase] + self.stepSize
+        else: # if unsuccessful stop trial
+            if not stopTimeArray[staircase] - self.stepSize < self.lowerLimit:
+                stopTimeArray[staircase] = stopTimeArray[staircase] - self.stepSize
+
+# Create QuestPolicy class
+#   Keeps a posterior distribution of the 50% stopping point (the SSD at which stopping succeeds on half of the trials)
+#   for every staircase on a grid of SSDs (gridStep ms apart, from lowerLimit to upperLimit). The probability of
+#   stopping at a given SSD is modelled as a logistic function of (SSD - 50% point) with scale slope (ms) and a lapse
+#   rate, and is precomputed for every SSD that can be presented (grid x SSD), so each update is a single multiply
+#   and normalise. The prior is a normal distribution (SD priorSD ms) centred on the starting SSD of each staircase.
+#   The next SSD is the mean of the posterior, rounded to the nearest ms and kept within the limits.
+class QuestPolicy:
+    def __init__(self, stopTimeArray, stepSize, lowerLimit, upperLimit, gridStep=5, slope=30, lapse=0.02, priorSD=150):
+        if upperLimit < lowerLimit: # the grid would be empty
+            raise ValueError('Upper SSD limit (%s ms) is below the lower SSD limit (%s ms)' % (upperLimit, lowerLimit))
+        self.lowerLimit = lowerLimit
+        self.upperLimit = upperLimit
+        self.grid = np.arange(lowerLimit, upperLimit + gridStep/2, gridStep, dtype=float) # possible 50% stopping points (ms)
+        ssds = np.arange(lowerLimit, upperLimit + 1) # every SSD (ms) that can be presented
+        pStop = lapse + (1 - 2*lapse)/(1 + np.exp((ssds[None,:] - self.grid[:,None])/slope)) # p(stop | 50% point, SSD)
+        self.likelihood = np.stack([1 - pStop, pStop]) # outcome (0 = failed, 1 = successful) x grid x SSD
+        self.posterior = np.exp(-0.5*((self.grid[None,:] - np.asarray(stopTimeArray, dtype=float)[:,None])/priorSD)**2) # staircase x grid
+        self.posterior = self.posterior/self.posterior.sum(axis=1, keepdims=True)
+
+    # Update the posterior of a staircase after a stop trial presented at stopTime and set its next SSD
+    def update(self, stopTimeArray, staircase, stopSuccess, stopTime):
+        ssd = min(max(int(round(stopTime)), self.lowerLimit), self.upperLimit) - self.lowerLimit # column of the presented SSD
+        posterior = self.posterior[staircase]*self.likelihood[int(stopSuccess), :, ssd]
+        self.posterior[staircase] = posterior/posterior.sum()
+        stopTimeArray[staircase] = min(max(int(round(self.posterior[staircase] @ self.grid)), self.lowerLimit), self.upperLimit)
+
+policies = {'Staircase': StaircasePolicy, 'Bayesian (QUEST)': QuestPolicy} # options of the 'SSD policy' general setting
@@ -0,0 +1,143 @@
+"""
+Selective Stopping Toolbox (SeleST)
+
+    SeleST_stats
+        Classes for keeping running statistics of performance during the task can be found in this script
+
+        Statistics are updated after every trial in a fixed amount of time (nothing is recomputed from earlier trials),
+        so stop success, go RTs, stop-signal delays and SSRT can be checked during the session (e.g., to spot a
+        participant who is waiting for the stop signal) rather than only after the analysis.
+
+    See the SeleST.py script for general information on the task
+"""
+
+# Import required modules
+import math
+from lib import SeleST_data
+
+stopTypes = {2: 'stopBoth', 3: 'stopLeft', 4: 'stopRight'} # stop trial types (trialType: column prefix in *_blockStats.txt)
+
+# Create RunningStats class
+#   Running count, mean and variance of a series of values (Welford's algorithm), updated one value at a time
+class RunningStats:
+    def __init__(self):
+        self.n = 0
+        self.mean = float('nan')
+        self.M2 = 0.0 # sum of squared differences from the mean
+
+    def add(self, x):
+        self.n = self.n + 1
+        if self.n == 1:
+            self.mean = x
+        else:
+            delta = x - self.mean
+            self.mean = self.mean + delta/self.n
+            self.M2 = self.M2 + delta*(x - self.mean)
+
+    @property
+    def var(self): # sample variance
+        return self.M2/(self.n - 1) if self.n > 1 else float('nan')
+
+    @property
+    def sd(self):
+        return math.sqrt(self.var)
+
+# Create TrialStats class
+#   Running statistics for a set of trials (e.g., a block or the whole session): go RTs and omissions of go trials, and
+#   the number of stop trials, successful stops and stop-signal delays of each stop trial type
+class TrialStats:
+    def __init__(self):
+        self.nTrials = 0
+        self.nGo = 0
+        self.nOmissions = 0 # go trials without a response
+        self.goRT = RunningStats() # go RT (ms from trial onset, mean of the cued keys that were pressed)
+        self.nStop = {t: 0 for t in stopTypes}
+        self.nStopSuccess = {t: 0 for t in stopTypes}
+        self.stopTime = {t: RunningStats() for t in stopTypes} # stop-signal time (ms from trial onset)
+
+    def add(self, trialType, goRT, stopTime, stopSuccess):
+        self.nTrials = self.nTrials + 1
+        if trialType == 1:
+            self.nGo = self.nGo + 1
+            if math.isnan(goRT):
+                self.nOmissions = self.nOmissions + 1
+            else:
+                self.goRT.add(goRT)
+        elif trialType in stopTypes:
+            self.nStop[trialType] = self.nStop[trialType] + 1
+            self.nStopSuccess[trialType] = self.nStopSuccess[trialType] + stopSuccess
+            self.stopTime[trialType].add(stopTime)
+
+    # Proportion of go trials without a response
+    def omissionRate(self):
+        return self.nOmissions/self.nGo if self.nGo > 0 else float('nan')
+
+    # Proportion of successful stop trials of a stop trial type
+    def stopSuccess(self, trialType):
+        return self.nStopSuccess[trialType]/self.nStop[trialType] if self.nStop[trialType] > 0 else float('nan')
+
+    # SSRT (ms) of a stop trial type estimated with the mean method: mean go RT minus mean stop-signal time. Go RTs and
+    # stop-signal times are both relative to trial onset, so this works for both ARI and SST. The mean method is only
+    # accurate when stop success is close to 50% (as targeted by the staircase), the integration method used in
+    # example_analysis should be used for final estimates.
+    def ssrt(self, trialType):
+        return self.goRT.mean - self.stopTime[trialType].mean
+
+# Create SessionStats class
+#   Updated after every trial (see SeleST_run.runTask) with running statistics of the current block and of all
+#   experimental blocks so far (practice blocks are only included in the block statistics). The statistics can be read
+#   at any point (e.g., exp.sessionStats.session.ssrt(2)) and a summary of every block is printed and saved to
+#   *_blockStats.txt next to the data file. A warning is printed if stop success or go omissions suggest that the
+#   participant is not doing the task as instructed.
+class SessionStats:
+    minStopSuccess = 0.25 # warn if stop success of a block is outside of these limits
+    maxStopSuccess = 0.75
+    maxOmissionRate = 0.1 # warn if more go trials than this are missed in a block
+
+    def __init__(self, exp):
+        self.enabled = exp.advSettings['Save block statistics?'] == True and exp.taskInfo['Save data?'] == True
+        if self.enabled:
+            columns = ' '.join('%s_n %s_success %s_ssd %s_ssrt'%(name, name, name, name) for name in stopTypes.values())
+            self.summaryWriter = SeleST_data.DataWriter(exp.Output+'_blockStats.txt',
+                header='block nTrials nGo goOmissionPercent meanGoRT sdGoRT %s\n'%columns)
+        self.block = TrialStats()
+        self.session = TrialStats()
+        self.currentSSD = {t: float('nan') for t in stopTypes} # stop-signal delay of the staircase last used by each stop trial type
+
+    # Add the trial that just finished (after feedback and staircaseSSD)
+    def update(self, trialInfo, stopInfo, thisTrial):
+        if trialInfo.choiceList[trialInfo.blockTrialCount-1] == 2: # RTs of the cued keys
+            RTs = thisTrial.RTs[2:4]
+        else:
+            RTs = thisTrial.RTs[0:2]
+        RTs = [rt for rt in RTs if not math.isnan(rt)]
+        goRT = sum(RTs)/len(RTs) if RTs else float('nan')
+        self.block.add(thisTrial.trialType, goRT, thisTrial.stopTime, thisTrial.stopSuccess)
+        if trialInfo.blockCount > 0:
+            self.session.add(thisTrial.trialType, goRT, thisTrial.stopTime, thisTrial.stopSuccess)
+        if thisTrial.trialType in stopTypes:
+            self.currentSSD[thisTrial.trialType] = stopInfo.stopTimeArray[thisTrial.staircase]
+
+    # Print and save the summary of the block that just finished (SSRT is for all experimental blocks so far)
+    def endBlock(self, trialInfo):
+        if self.block.nTrials == 0:
+            return
+        block, session = self.block, self.session
+        print('Block %s: go RT %.0f ms (%.0f%% missed), stop success %s'%(trialInfo.blockCount, block.goRT.mean, block.omissionRate()*100,
+            ', '.join('%s %.0f%%'%(name, block.stopSuccess(t)*100) for t, name in stopTypes.items() if block.nStop[t] > 0)))
+        if block.omissionRate() > self.maxOmissionRate:
+            print('WARNING: %.0f%% of go trials were missed in block %s'%(block.omissionRate()*100, trialInfo.blockCount))
+        for t, name in stopTypes.items():
+            if block.nStop[t] > 0 and not self.minStopSuccess <= block.stopSuccess(t) <= self.maxStopSuccess:
+                print('WARNING: %s stop success was %.0f%% in block %s'%(name, block.stopSuccess(t)*100, trialInfo.blockCount))
+        if self.enabled:
+            columns = ' '.join('%s %.3f %s %.1f'%(block.nStop[t], block.stopSuccess(t), self.currentSSD[t], session.ssrt(t)) for t in stopTypes)
+            self.summaryWriter.write('%s %s %s %.1f %.1f %.1f %s\n'%(trialInfo.blockCount, block.nTrials, block.nGo, block.omissionRate()*100,
+                block.goRT.mean, block.goRT.sd, columns))
+            self.summaryWriter.sync()
+        self.block = TrialStats()
+
+    # Write remaining statistics and close file
+    def close(self):
+        if self.enabled:
+            self.summaryWriter.close()
@@ -0,0 +1,108 @@
+"""
+Selective Stopping Toolbox (SeleST)
+
+    SeleST_timing
+        Classes for monitoring frame timing during the task can be found in this script
+
+    See the SeleST.py script for general information on the task
+"""
+
+# Import required modules
+import time
+import numpy as np
+from lib import SeleST_data
+
+# Create FrameLog class
+#   Replaces exp.win.flip() during a trial (see SeleST.py) and records, for every frame, the flip timestamp, the
+#   time spent updating stimuli (runTrial and stop_signal) before the flip, and whether frames were dropped.
+#   A frame is counted as dropped when the interval between flips exceeds 1.5 frame durations.
+#   Frame-by-frame data are saved to *_frames.txt and block summaries to *_frameSummary.txt next to the data file.
+class FrameLog:
+    def __init__(self, exp):
+        self.win = exp.win
+        self.frameDur = exp.frameDur # expected frame duration (ms)
+        self.enabled = exp.advSettings['Log frame timing?'] == True and exp.taskInfo['Save data?'] == True
+        if self.enabled:
+            self.frameWriter = SeleST_data.DataWriter(exp.Output+'_frames.txt',
+                header='block trial frame flipTime interval workTime dropped stopSignal\n')
+            self.summaryWriter = SeleST_data.DataWriter(exp.Output+'_frameSummary.txt',
+                header='block nTrials nFrames nDropped droppedPercent meanInterval sdInterval maxInterval meanWorkTime p99WorkTime maxWorkTime\n')
+        # Preallocate arrays (in ms) for the frames of a trial, these grow if a trial ever needs more frames
+        maxFrames = int(np.ceil(exp.advSettings['Trial length (s)']/(self.frameDur/1000)))*2 + 10
+        self.flipTimes = np.zeros(maxFrames)
+        self.workTimes = np.zeros(maxFrames)
+        self.stopShown = np.zeros(maxFrames, dtype=np.int8)
+        self.nFrames = 0
+        self.thisTrial = None
+        self.lastFlipEnd = time.perf_counter()
+        self.blockIntervals = [] # intervals and work times of every trial in the current block
+        self.blockWorkTimes = []
+        self.blockTrials = 0
+
+    # Reset frame counter at the start of a trial
+    def startTrial(self, thisTrial):
+        self.thisTrial = thisTrial
+        self.nFrames = 0
+        self.lastFlipEnd = time.perf_counter()
+
+    # Flip the window and record the timing of the frame
+    def flip(self):
+        if not self.enabled:
+            return self.win.flip()
+        workEnd = time.perf_counter() # time at which stimulus updates for this frame finished
+        flipTime = self.win.flip()
+        self.lastFlipEnd, workStart = time.perf_counter(), self.lastFlipEnd
+        if flipTime is None: # flip timestamp unavailable, use time flip returned
+            flipTime = self.lastFlipEnd
+        if self.nFrames == len(self.flipTimes): # grow arrays if needed
+            self.flipTimes = np.concatenate([self.flipTimes, np.zeros(len(self.flipTimes))])
+            self.workTimes = np.concatenate([self.workTimes, np.zeros(len(self.workTimes))])
+            self.stopShown = np.concatenate([self.stopShown, np.zeros(len(self.stopShown), dtype=np.int8)])
+        self.flipTimes[self.nFrames] = flipTime*1000
+        self.workTimes[self.nFrames] = (workEnd - workStart)*1000
+        self.stopShown[self.nFrames] = self.thisTrial.trialType > 1 and self.thisTrial.stopSignal == False
+        self.nFrames = self.nFrames + 1
+        return flipTime
+
+    # Save frame timing of the trial that just finished
+    def endTrial(self, trialInfo):
+        if not self.enabled or self.nFrames == 0:
+            return
+        n = self.nFrames
+        flipTimes = self.flipTimes[:n] - self.flipTimes[0] # flip times relative to first frame of the trial
+        intervals = np.diff(self.flipTimes[:n], prepend=self.flipTimes[0])
+        dropped = np.maximum(np.round(intervals/self.frameDur) - 1, 0).astype(int) # number of frames dropped before each flip
+        dropped[intervals < 1.5*self.frameDur] = 0
+        lines = ['%s %s %s %.2f %.2f %.3f %s %s\n'%(trialInfo.blockCount, trialInfo.trialCount, f, flipTimes[f], intervals[f], self.workTimes[f], dropped[f], self.stopShown[f]) for f in range(n)]
+        self.frameWriter.write(''.join(lines))
+        if dropped.sum() > 0:
+            print('WARNING: %s frame(s) dropped during trial (longest frame was %s ms)'%(dropped.sum(), round(intervals.max(),1)))
+        self.blockIntervals.append(intervals[1:])
+        self.blockWorkTimes.append(self.workTimes[:n].copy())
+        self.blockTrials = self.blockTrials + 1
+
+    # Save summary of frame timing for the block that just finished
+    def endBlock(self, trialInfo):
+        if not self.enabled or self.blockTrials == 0:
+            return
+        intervals = np.concatenate(self.blockIntervals)
+        workTimes = np.concatenate(self.blockWorkTimes)
+        dropped = np.maximum(np.round(intervals/self.frameDur) - 1, 0)
+        dropped[intervals < 1.5*self.frameDur] = 0
+        nDropped = int(dropped.sum())
+        if len(intervals) == 0: # only single-frame trials in the block
+            intervals = np.zeros(1)
+        self.summaryWriter.write('%s %s %s %s %.2f %.3f %.3f %.3f %.3f %.3f %.3f\n'%(trialInfo.blockCount, self.blockTrials, len(workTimes), nDropped,
+            nDropped/(len(workTimes)+nDropped)*100, intervals.mean(), intervals.std(), intervals.max(), workTimes.mean(), np.percentile(workTimes,99), workTimes.max()))
+        print('Block %s: %s dropped frame(s), mean frame interval %s ms'%(trialInfo.blockCount, nDropped, round(intervals.mean(),2)))
+        self.frameWriter.sync()
+        self.summaryWriter.sync()
+        self.blockIntervals = []
+        self.blockWorkTimes = []
+        self.blockTrials = 0
+
+    # Write remaining frame data and close files
+    def close(self):
+        if self.enabled:
+            self.frameWriter.close()
+            self.summaryWriter.close()
@@ -0,0 +1,144 @@
+"""
+Selective Stopping Toolbox (SeleST)
+
+    SeleST_trials
+        Functions for generating trial arrays (e.g., for SeleST_trialArrayCreator.py) can be found in this script
+
+        Trial arrays are built as a dictionary of NumPy column arrays (column name -> array with one value per trial),
+        which can be turned into a table with pandas.DataFrame(columns) and saved with .to_csv().
+
+    See the SeleST.py script for general information on the task
+"""
+
+# Import required modules
+import numpy as np
+
+# Define blockColumns function
+#   Creates a standard block from a list of trial types. Each trial type is a dictionary with n_repeats (number of
+#   times to repeat the trial type per block) and the values of each column (e.g., trialName, trialType, ssd), see
+#   SeleST_trialArrayCreator.py. Returns the columns of the block (trial types are repeated in the order of trialList).
+def blockColumns(trialList):
+    repeats = [trial['n_repeats'] for trial in trialList]
+    names = [name for name in trialList[0] if name != 'n_repeats']
+    return {name: np.repeat(np.array([trial[name] for trial in trialList]), repeats) for name in names}
+
+# Define sequenceBlock function
+#   Returns the order of the trials of one block (indices into trialTypes, 1 = go, >1 = stop) built directly so that:
+#       - the first nForcedGo trials are go trials
+#       - there are no more than maxStopRun stop trials in a row (0 = no limit)
+#       - there are at least minStopGap trials between two stop trials of the same type (0 = no limit)
+#   Without maxStopRun and minStopGap, forced go trials are drawn from the go trials and the remaining trials are
+#   shuffled, giving every valid order the same probability. Otherwise trials are drawn one position at a time from
+#   those that can still lead to a valid order (weighted by the number of trials left of each type), which takes a
+#   fixed amount of time per trial. Drawing restarts if the minStopGap constraint leads to a dead end, and an error is
+#   raised if no valid order is found in maxAttempts attempts.
+def sequenceBlock(trialTypes, nForcedGo=0, maxStopRun=0, minStopGap=0, rng=None, maxAttempts=100):
+    rng = np.random.default_rng(rng)
+    trialTypes = np.asarray(trialTypes)
+    nGo = np.sum(trialTypes == 1)
+    nStop = len(trialTypes) - nGo
+    if nGo < nForcedGo:
+        raise ValueError('Cannot start blocks with %s go trials as there are only %s go trials per block' % (nForcedGo, nGo))
+    if maxStopRun > 0 and nStop > (nGo - nForcedGo + 1) * maxStopRun:
+        raise ValueError('Cannot have %s stop trials with no more than %s stop trials in a row' % (nStop, maxStopRun))
+    if maxStopRun == 0 and minStopGap == 0:
+        forced = rng.choice(np.flatnonzero(trialTypes == 1), nForcedGo, replace=False)
+        rest = np.setdiff1d(np.arange(len(trialTypes)), forced)
+        return np.concatenate([forced, rng.permutation(rest)]).astype(int)
+    for attempt in range(maxAttempts):
+        order = _drawOrder(trialTypes, nForcedGo, maxStopRun, minStopGap, rng)
+        if order is not None:
+            return order
+    raise ValueError('Could not create a block order that meets the trial constraints (n forced go trials = %s, max stop trials in a row = %s, min trials between same stop type = %s)' % (nForcedGo, maxStopRun, minStopGap))
+
+# Draw a block order one position at a time (see sequenceBlock), returns None if a dead end is reached
+def _drawOrder(trialTypes, nForcedGo, maxStopRun, minStopGap, rng):
+    types = np.unique(trialTypes)
+    remaining = {t: list(rng.permutation(np.flatnonzero(trialTypes == t))) for t in types} # trials left of each type
+    lastPos = {t: -len(trialTypes) for t in types} # position of last trial of each type
+    order = []
+    run = 0 # current number of stop trials in a row
+    for pos in range(len(trialTypes)):
+        nGoLeft = len(remaining.get(1, []))
+        nStopLeft = len(trialTypes) - pos - nGoLeft
+        options = []
+        for t in types:
+            if len(remaining[t]) == 0:
+                continue
+            if t == 1: # go trial allowed if the remaining stop trials can still be separated by the remaining go trials
+                if maxStopRun == 0 or nStopLeft <= nGoLeft * maxStopRun or pos < nForcedGo:
+                    options.append(t)
+            elif pos >= nForcedGo and (maxStopRun == 0 or run < maxStopRun) and (minStopGap == 0 or pos - lastPos[t] > minStopGap):
+                options.append(t)
+        if minStopGap > 0: # only keep options after which every stop type can still fit its remaining trials into the block
+            options = [t for t in options if all(_lastStopPos(s, t, pos, remaining, lastPos, minStopGap) < len(trialTypes) for s in types if s != 1)]
+        if not options:
+            return None
+        weights = np.array([len(remaining[t]) for t in options], dtype=float)
+        if minStopGap > 0: # favour stop types that are running out of room
+            slack = np.array([len(trialTypes) - _lastStopPos(t, None, pos, remaining, lastPos, minStopGap) if t != 1 else len(trialTypes) for t in options], dtype=float)
+            weights = weights / np.maximum(slack, 1)**2
+        t = options[rng.choice(len(options), p=weights/weights.sum())]
+        order.append(remaining[t].pop())
+        lastPos[t] = pos
+        run = 0 if t == 1 else run + 1
+    return np.array(order, dtype=int)
+
+# Earliest position at which the last remaining trial of stop type s can be presented if type t is presented at pos
+def _lastStopPos(s, t, pos, remaining, lastPos, minStopGap):
+    nLeft = len(remaining[s]) - (s == t)
+    if nLeft == 0:
+        return 0
+    last = pos if s == t else lastPos[s]
+    return max(pos + 1, last + minStopGap + 1) + (nLeft - 1) * (minStopGap + 1)
+
+# Define assignChoices function
+#   Returns a choice for each trial (in the order of trialTypes) so that every trial type gets the options in choices
+#   (e.g., trialInfo.choiceList) as evenly as possible, with the order of choices within each trial type randomised
+def assignChoices(trialTypes, choices, rng=None):
+    rng = np.random.default_rng(rng)
+    trialTypes = np.asarray(trialTypes)
+    options = np.unique(choices)
+    assigned = np.empty(len(trialTypes), dtype=options.dtype)
+    for t in np.unique(trialTypes):
+        idx = np.flatnonzero(trialTypes == t)
+        assigned[rng.permutation(idx)] = np.resize(rng.permutation(options), len(idx))
+    return assigned.tolist()
+
+# Define blockOrders function
+#   Returns an array (n blocks x n trials per block) with the order of the trials (indices into the standard block) of
+#   every block. Each block is randomised separately if randomise is True. Blocks are built to meet the constraints
+#   described in sequenceBlock (nForcedGo, maxStopRun and minStopGap).
+def blockOrders(trialTypes, nBlocks, randomise=True, nForcedGo=0, maxStopRun=0, minStopGap=0, rng=None):
+    rng = np.random.default_rng(rng)
+    trialTypes = np.asarray(trialTypes)
+    if randomise == True and (maxStopRun > 0 or minStopGap > 0):
+        return np.array([sequenceBlock(trialTypes, nForcedGo, maxStopRun, minStopGap, rng) for n in range(nBlocks)], dtype=int).reshape(nBlocks, len(trialTypes))
+    if nForcedGo > np.sum(trialTypes == 1):
+        raise ValueError('Cannot start blocks with %s go trials as there are only %s go trials per block' % (nForcedGo, np.sum(trialTypes == 1)))
+    orders = np.tile(np.arange(len(trialTypes)), (nBlocks, 1))
+    if randomise == True: # shuffle every block at once
+        orders = rng.permuted(orders, axis=1)
+    if nForcedGo > 0 and (trialTypes[orders[:, :nForcedGo]] != 1).any():
+        isGo = trialTypes[orders] == 1
+        goFirst = np.argsort(~isGo, axis=1, kind='stable') # go trials first (in their shuffled order), then the other trials
+        forced = np.take_along_axis(orders, goFirst[:, :nForcedGo], axis=1) # first nForcedGo go trials of each block
+        inForced = np.zeros(orders.shape, dtype=bool)
+        np.put_along_axis(inForced, goFirst[:, :nForcedGo], True, axis=1)
+        rest = rng.permuted(orders[~inForced].reshape(nBlocks, -1), axis=1) # shuffle remaining trials
+        orders = np.concatenate([forced, rest], axis=1)
+    return orders
+
+# Define trialArray function
+#   Returns the columns of a complete trial array (nBlocks blocks created from trialList, see above)
+def trialArray(trialList, nBlocks, randomise=True, nForcedGo=0, maxStopRun=0, minStopGap=0, rng=None):
+    block = blockColumns(trialList)
+    index = blockOrders(block['trialType'], nBlocks, randomise, nForcedGo, maxStopRun, minStopGap, rng).ravel()
+    return {name: values[index] for name, values in block.items()}
+
+# Define participantSeed function
+#   Returns the seed for a participant's trials, derived from a master seed and the participant number. Seeds of
+#   different participants are independent and do not depend on how many participants are generated (or in what
+#   order), so any participant's trials can be recreated from the master seed alone.
+def participantSeed(masterSeed, participant):
+    return np.random.SeedSequence(masterSeed, spawn_key=(participant,))